@@ -1,26 +1,103 @@
 # app.py - Complete Enhanced ECG Generator with Accurate Timing
-from flask import Flask, render_template, jsonify, request, send_file
+from flask import Flask, render_template, jsonify, request, send_file, Response, stream_with_context
 import json
 import os
+import glob
+import hashlib
+import math
+import queue
+import tempfile
+import threading
+import time
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timezone
 import csv
 import io
 import base64
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+from contextlib import contextmanager
 from pathlib import Path
+from werkzeug.http import is_resource_modified
+from werkzeug.utils import secure_filename
+from ecg_kernels import ECG_KERNEL_BACKEND, kernels, verify_kernel_parity, pqrst_params
+from ecg_hrv import batch_hrv_metrics, hrv_metrics
 
 app = Flask(__name__)
 
+# WebSocket live monitor is optional (pip install flask-sock)
+try:
+    from flask_sock import Sock
+    sock = Sock(app)
+except ImportError:
+    sock = None
+
+# Report watching uses inotify/FSEvents when watchdog is installed (pip install watchdog)
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+
 # Configuration
 REPORTS_DIR = Path("reports")
 EXPORTS_DIR = Path("exports")
+UPLOADS_DIR = Path("uploads")
+
+# Exports store limits (files older than the TTL or beyond the quotas are evicted)
+EXPORT_TTL_SECONDS = 24 * 60 * 60
+EXPORT_MAX_BYTES = 500 * 1024 * 1024
+EXPORT_MAX_FILES = 1000
+EXPORT_TMP_MAX_AGE = 10 * 60  # temporary files older than this were left by failed writes
+
+# Live monitor streaming
+LIVE_FRAME_SECONDS = 0.04  # one WebSocket frame every 40 ms
+LIVE_CHUNK_SECONDS = 1.0  # samples are rendered in chunks and sliced into frames
+LIVE_SUBSCRIBER_QUEUE = 50  # frames buffered per viewer before old ones are dropped
+
+# Recorded ECG analysis (files are memory-mapped and processed chunk by chunk)
+RECORDING_CHUNK_SECONDS = 60
+RECORDING_OVERLAP_SECONDS = 2  # context on each side so beats at chunk edges are seen whole
+RECORDING_BEATS_PER_CHUNK = 5  # beats per chunk used for P/QRS/QT interval measurement
+MAX_UPLOAD_BYTES = 2 * 1024 * 1024 * 1024
+
+# Admission control for generation requests
+MAX_GENERATION_SAMPLES = 500 * 600  # largest single request (10 minutes of one lead at 500 Hz)
+GENERATION_BYTES_PER_SAMPLE = 500  # measured peak: sample dicts + arrays + JSON response
+GENERATION_SAMPLES_PER_SECOND = 200_000  # measured single-core throughput, for CPU estimates
+GLOBAL_MAX_CONCURRENT = 4
+GLOBAL_MEMORY_BUDGET = 1024 * 1024 * 1024
+CLIENT_MAX_CONCURRENT = 2
+CLIENT_MEMORY_BUDGET = 512 * 1024 * 1024
+MAX_QUEUED_REQUESTS = 32
+QUEUE_TIMEOUT_SECONDS = 10
+HRV_CHECK_MAX_DURATION = 3600  # seconds of RR series per report for /api/hrv_check
+HRV_BYTES_PER_BEAT = 40  # measured: padded RR matrices and per-beat intermediates
+HRV_BASE_BYTES = 256 * 1024 * 1024  # measured: Lomb-Scargle block working set
+HRV_BEATS_PER_SECOND = 50_000  # measured: RR generation plus batch analysis
+RECORDING_BYTES_PER_SAMPLE = 2000  # measured peak per sample of the chunk being analysed
+RECORDING_SAMPLES_PER_SECOND = 150_000
+# Per-client budgets are keyed on the remote address, or on this request header
+# when set (behind a proxy, or to give load-test clients distinct identities)
+GOVERNOR_CLIENT_HEADER = os.environ.get('ECG_CLIENT_HEADER')
+
+# Precompute pipeline for newly arrived reports
+PRECOMPUTE_DIR = Path("precomputed")
+PRECOMPUTE_LEADS = ('Lead II',)  # leads the dashboard opens first
+PRECOMPUTE_DURATION = 10
+PRECOMPUTE_WORKERS = 2
+PRECOMPUTE_MAX_BACKLOG = 1000  # pending reports; the lowest priority ones are dropped beyond this
+PRECOMPUTE_SETTLE_SECONDS = 1.0  # a report is processed once it has not changed for this long
+PRECOMPUTE_POLL_SECONDS = 2.0  # directory scan interval without watchdog
+PRECOMPUTE_CLIENT = 'precompute'  # governor client name for background work
 
 # Create directories if they don't exist
 REPORTS_DIR.mkdir(exist_ok=True)
 EXPORTS_DIR.mkdir(exist_ok=True)
+UPLOADS_DIR.mkdir(exist_ok=True)
+
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
 
 # ECG Lead configurations with different amplitude characteristics
 ECG_LEADS = {
@@ -38,334 +115,266 @@ ECG_LEADS = {
     'V6': {'amplitude': 1.2, 'baseline': 0, 'description': 'Left midaxillary line'}
 }
 
+# Per-beat annotation table columns emitted by the generator (int32 sample indices)
+ANNOTATION_KEYS = (
+    'beat_onset', 'p_onset', 'p_offset', 'qrs_onset', 'r_peak',
+    'qrs_offset', 't_onset', 't_peak', 't_offset'
+)
+
 class ECGGenerator:
-    def __init__(self):
-        self.sample_rate = 500  # Hz - standard medical ECG sampling rate
+    def __init__(self, sample_rate=500):
+        self.sample_rate = sample_rate  # Hz - 500 is the standard medical ECG sampling rate
         self.leads = ECG_LEADS
         
-    def generate_ecg_from_report(self, report_data, lead='Lead II', duration=10):
-        """Generate physiologically accurate ECG waveform from report data"""
+    def generate_ecg_from_report(self, report_data, lead='Lead II', duration=10, with_annotations=False):
+        """Generate physiologically accurate ECG waveform from report data
+        
+        With ``with_annotations=True`` a ``(data, annotations)`` tuple is returned,
+        where ``annotations`` is the per-beat table from ``_build_annotations``.
+        """
         try:
-            # Extract all vital signs from report
-            heart_rate = float(report_data.get('heart_rate', 72))
-            hrv_sdnn = float(report_data.get('hrv_sdnn', 80))
-            mean_rri = float(report_data.get('mean_rri', 833))
-            rmssd = float(report_data.get('rmssd', 65))
-            stress_level = self._map_stress_level(report_data.get('stress_level', 2))
-            breathing_rate = float(report_data.get('breathing_rate', 16))
-            oxygen_saturation = float(report_data.get('oxygen_saturation', 98))
-            blood_pressure = report_data.get('blood_pressure', '120/80')
-            pns_index = float(report_data.get('pns_index', 0))
-            sns_index = float(report_data.get('sns_index', 0))
-            lf_hf = float(report_data.get('lf_hf', 1.0))
-            
-            # Parse blood pressure
-            try:
-                if blood_pressure and blood_pressure != '00/00':
-                    bp_parts = blood_pressure.split('/')
-                    systolic = float(bp_parts[0])
-                    diastolic = float(bp_parts[1])
-                else:
-                    systolic, diastolic = 120, 80
-            except:
-                systolic, diastolic = 120, 80
+            trace = self._prepare_trace(report_data, lead)
             
             # Generate samples
             total_samples = duration * self.sample_rate
-            data = []
+            sample_times = np.arange(total_samples) / self.sample_rate
             
             # Handle flatline condition (no cardiac activity)
-            if heart_rate == 0:
-                for i in range(total_samples):
-                    current_time = i / self.sample_rate
-                    baseline_wander = 0.01 * np.sin(2 * np.pi * 0.1 * current_time)
-                    noise = np.random.normal(0, 0.003)
-                    data.append({
-                        'time': round(current_time, 3),
-                        'amplitude': round(baseline_wander + noise, 4),
-                        'sample_index': i,
-                        'beat_count': 0
-                    })
+            if trace is None:
+                amplitudes = self._render_flatline(sample_times)
+                data = self._to_points(sample_times, amplitudes, np.zeros(total_samples, dtype=np.int64))
+                if with_annotations:
+                    return data, self._build_annotations([], 0, total_samples)
                 return data
             
-            # Calculate physiological parameters
-            heart_rate = max(20, min(250, heart_rate))  # Clamp to physiological limits
-            
-            # Get lead configuration
-            lead_config = self.leads.get(lead, self.leads['Lead II'])
-            base_amplitude = lead_config['amplitude']
-            
-            # Amplitude modifiers based on conditions
-            amplitude_modifier = 1.0
-            
-            # Blood pressure effects
-            if systolic > 140:  # Hypertension
-                amplitude_modifier *= 1.15  # Increased voltage
-            elif systolic < 90 and systolic > 0:  # Hypotension
-                amplitude_modifier *= 0.75
-            
-            # Oxygen saturation effects
-            if oxygen_saturation < 90 and oxygen_saturation > 0:
-                amplitude_modifier *= (oxygen_saturation / 100)
-            
-            # Calculate beat timing with HRV
-            if mean_rri > 0:
-                base_rr_interval = mean_rri / 1000.0  # Convert to seconds
-            else:
-                base_rr_interval = 60.0 / heart_rate
-            
             # Generate beat times with HRV
             beat_times = []
             current_time = 0
             
             while current_time < duration:
-                # Add HRV variation
-                if hrv_sdnn > 0:
-                    # Use actual HRV parameters
-                    hrv_variation = np.random.normal(0, hrv_sdnn / 1000.0)
-                    rr_interval = base_rr_interval + hrv_variation
-                    
-                    # Apply RMSSD for short-term variation
-                    if rmssd > 0:
-                        rmssd_variation = np.random.normal(0, rmssd / 2000.0)
-                        rr_interval += rmssd_variation
-                else:
-                    rr_interval = base_rr_interval
-                
-                # Ensure physiological limits
-                rr_interval = max(0.24, min(3.0, rr_interval))  # 20-250 bpm
-                
                 beat_times.append(current_time)
-                current_time += rr_interval
+                current_time += self._next_rr_interval(trace)
             
-            # Generate ECG samples
-            for i in range(total_samples):
-                sample_time = i / self.sample_rate
-                amplitude = 0
-                
-                # Find which beat cycle we're in
-                beat_index = 0
-                for j, beat_time in enumerate(beat_times):
-                    if sample_time >= beat_time:
-                        beat_index = j
-                    else:
-                        break
-                
-                if beat_index < len(beat_times):
-                    # Calculate position within current beat
-                    beat_start = beat_times[beat_index]
-                    if beat_index < len(beat_times) - 1:
-                        beat_duration = beat_times[beat_index + 1] - beat_start
-                    else:
-                        beat_duration = base_rr_interval
-                    
-                    # Time since beat start
-                    time_in_beat = sample_time - beat_start
-                    
-                    if 0 <= time_in_beat < beat_duration:
-                        # Generate PQRST complex
-                        amplitude = self._generate_accurate_pqrst(
-                            time_in_beat,
-                            beat_duration,
-                            base_amplitude * amplitude_modifier,
-                            heart_rate,
-                            stress_level,
-                            oxygen_saturation,
-                            systolic,
-                            diastolic,
-                            pns_index,
-                            sns_index,
-                            lf_hf
-                        )
-                
-                # Add respiratory baseline variation
-                if breathing_rate > 0:
-                    # Respiratory sinus arrhythmia
-                    resp_amplitude = 0.02
-                    if pns_index < -0.5:  # Low parasympathetic activity
-                        resp_amplitude = 0.01
-                    elif pns_index > 0.5:  # High parasympathetic activity
-                        resp_amplitude = 0.03
-                    
-                    respiratory_effect = resp_amplitude * np.sin(2 * np.pi * breathing_rate * sample_time / 60)
-                    amplitude += respiratory_effect
-                
-                # Add realistic noise
-                noise_level = 0.005
-                if oxygen_saturation < 95 and oxygen_saturation > 0:
-                    noise_level = 0.01  # More noise with poor perfusion
-                amplitude += np.random.normal(0, noise_level)
-                
-                data.append({
-                    'time': round(sample_time, 3),
-                    'amplitude': round(amplitude, 4),
-                    'sample_index': i,
-                    'beat_count': beat_index
-                })
+            amplitudes, beat_indices = self._render(trace, sample_times, np.asarray(beat_times))
+            data = self._to_points(sample_times, amplitudes, beat_indices)
             
+            if with_annotations:
+                return data, self._build_annotations(beat_times, trace['base_rr_interval'], total_samples)
             return data
             
         except Exception as e:
             print(f"ECG generation error: {e}")
             import traceback
             traceback.print_exc()
+            if with_annotations:
+                return [], None
             return []
     
-    def _generate_accurate_pqrst(self, time_in_beat, beat_duration, base_amplitude, 
-                                 heart_rate, stress_level, oxygen_saturation,
-                                 systolic, diastolic, pns_index, sns_index, lf_hf):
-        """Generate accurate PQRST complex with proper timing"""
+    def _prepare_trace(self, report_data, lead):
+        """Derive generation parameters from report data (None means flatline)"""
+        # Extract all vital signs from report
+        heart_rate = float(report_data.get('heart_rate', 72))
+        hrv_sdnn = float(report_data.get('hrv_sdnn', 80))
+        mean_rri = float(report_data.get('mean_rri', 833))
+        rmssd = float(report_data.get('rmssd', 65))
+        stress_level = self._map_stress_level(report_data.get('stress_level', 2))
+        breathing_rate = float(report_data.get('breathing_rate', 16))
+        oxygen_saturation = float(report_data.get('oxygen_saturation', 98))
+        blood_pressure = report_data.get('blood_pressure', '120/80')
+        pns_index = float(report_data.get('pns_index', 0))
+        sns_index = float(report_data.get('sns_index', 0))
+        lf_hf = float(report_data.get('lf_hf', 1.0))
+        
+        # Parse blood pressure
+        try:
+            if blood_pressure and blood_pressure != '00/00':
+                bp_parts = blood_pressure.split('/')
+                systolic = float(bp_parts[0])
+                diastolic = float(bp_parts[1])
+            else:
+                systolic, diastolic = 120, 80
+        except:
+            systolic, diastolic = 120, 80
         
-        if beat_duration <= 0:
-            return 0
+        if heart_rate == 0:
+            return None
         
-        # Normalize time to 0-1 range within beat
-        norm_time = time_in_beat / beat_duration
+        # Calculate physiological parameters
+        heart_rate = max(20, min(250, heart_rate))  # Clamp to physiological limits
         
-        amplitude = 0
+        # Get lead configuration
+        lead_config = self.leads.get(lead, self.leads['Lead II'])
+        base_amplitude = lead_config['amplitude']
         
-        # Define wave timings based on heart rate
-        # These are fractions of the beat duration
+        # Amplitude modifiers based on conditions
+        amplitude_modifier = 1.0
         
-        # P wave: 80-100ms typically
-        p_start = 0.05
-        p_duration = min(0.1 / beat_duration, 0.12)  # 100ms max, scaled to beat
-        p_end = p_start + p_duration
+        # Blood pressure effects
+        if systolic > 140:  # Hypertension
+            amplitude_modifier *= 1.15  # Increased voltage
+        elif systolic < 90 and systolic > 0:  # Hypotension
+            amplitude_modifier *= 0.75
         
-        # PR interval: 120-200ms
-        pr_interval = min(0.16 / beat_duration, 0.2)  # 160ms typical, scaled
+        # Oxygen saturation effects
+        if oxygen_saturation < 90 and oxygen_saturation > 0:
+            amplitude_modifier *= (oxygen_saturation / 100)
         
-        # QRS complex: 80-100ms
-        qrs_start = p_start + pr_interval
-        qrs_duration = min(0.09 / beat_duration, 0.11)  # 90ms typical
-        qrs_end = qrs_start + qrs_duration
+        # Calculate beat timing with HRV
+        if mean_rri > 0:
+            base_rr_interval = mean_rri / 1000.0  # Convert to seconds
+        else:
+            base_rr_interval = 60.0 / heart_rate
         
-        # ST segment: 80-120ms
-        st_duration = min(0.1 / beat_duration, 0.12)
-        st_end = qrs_end + st_duration
+        # Respiratory sinus arrhythmia
+        resp_amplitude = 0.02
+        if pns_index < -0.5:  # Low parasympathetic activity
+            resp_amplitude = 0.01
+        elif pns_index > 0.5:  # High parasympathetic activity
+            resp_amplitude = 0.03
         
-        # T wave: 160-200ms
-        t_duration = min(0.18 / beat_duration, 0.25)
-        t_end = st_end + t_duration
+        # Realistic noise
+        noise_level = 0.005
+        if oxygen_saturation < 95 and oxygen_saturation > 0:
+            noise_level = 0.01  # More noise with poor perfusion
         
-        # P Wave
-        if p_start <= norm_time < p_end:
-            p_phase = (norm_time - p_start) / p_duration
-            p_amplitude = 0.12 * base_amplitude
-            
-            # P wave modifications
-            if systolic > 140:  # P mitrale in hypertension
-                p_amplitude *= 1.3
-            if heart_rate > 100:  # Smaller P waves in tachycardia
-                p_amplitude *= 0.8
+        return {
+            'hrv_sdnn': hrv_sdnn,
+            'rmssd': rmssd,
+            'base_rr_interval': base_rr_interval,
+            'breathing_rate': breathing_rate,
+            'resp_amplitude': resp_amplitude,
+            'noise_level': noise_level,
+            'pqrst_params': pqrst_params(base_amplitude * amplitude_modifier, heart_rate, stress_level,
+                                          oxygen_saturation, systolic, sns_index, lf_hf)
+        }
+    
+    def _next_rr_interval(self, trace):
+        """Draw the next RR interval (seconds) with HRV"""
+        rr_interval = trace['base_rr_interval']
+        
+        # Add HRV variation
+        if trace['hrv_sdnn'] > 0:
+            # Use actual HRV parameters
+            rr_interval += np.random.normal(0, trace['hrv_sdnn'] / 1000.0)
             
-            amplitude = p_amplitude * np.sin(p_phase * np.pi)
+            # Apply RMSSD for short-term variation
+            if trace['rmssd'] > 0:
+                rr_interval += np.random.normal(0, trace['rmssd'] / 2000.0)
         
-        # PR Segment (isoelectric)
-        elif p_end <= norm_time < qrs_start:
-            amplitude = np.random.normal(0, 0.002)
+        # Ensure physiological limits
+        return max(0.24, min(3.0, rr_interval))  # 20-250 bpm
+    
+    def _render(self, trace, sample_times, beat_starts):
+        """Render amplitudes and beat indices for sample_times given beat start times
         
-        # QRS Complex
-        elif qrs_start <= norm_time < qrs_end:
-            qrs_phase = (norm_time - qrs_start) / qrs_duration
-            
-            # Q wave (first 15% of QRS)
-            if qrs_phase < 0.15:
-                q_phase = qrs_phase / 0.15
-                q_amplitude = -0.15 * base_amplitude
-                
-                # Pathological Q waves in ischemia
-                if oxygen_saturation < 85 and oxygen_saturation > 0:
-                    q_amplitude *= 2.0
-                
-                amplitude = q_amplitude * np.sin(q_phase * np.pi)
-            
-            # R wave (15-60% of QRS)
-            elif qrs_phase < 0.6:
-                r_phase = (qrs_phase - 0.15) / 0.45
-                r_amplitude = base_amplitude
-                
-                # R wave modifications
-                if heart_rate > 150:
-                    r_amplitude *= 0.7  # Decreased amplitude in severe tachycardia
-                elif heart_rate < 50:
-                    r_amplitude *= 1.15  # Increased amplitude in bradycardia
-                
-                # Stress effects (sympathetic/parasympathetic balance)
-                if sns_index > 0.5:  # High sympathetic activity
-                    r_amplitude *= 1.1
-                if stress_level == 'High':
-                    r_amplitude *= 1.05
-                elif stress_level == 'Low' or stress_level == 'None':
-                    r_amplitude *= 0.95
-                
-                # Hypertension effects (LVH pattern)
-                if systolic > 160:
-                    r_amplitude *= 1.3
-                
-                amplitude = r_amplitude * np.sin(r_phase * np.pi)
-            
-            # S wave (last 40% of QRS)
-            else:
-                s_phase = (qrs_phase - 0.6) / 0.4
-                s_amplitude = -0.3 * base_amplitude
-                amplitude = s_amplitude * np.sin(s_phase * np.pi)
-        
-        # ST Segment
-        elif qrs_end <= norm_time < st_end:
-            st_phase = (norm_time - qrs_end) / st_duration
-            
-            # ST changes based on ischemia
-            if oxygen_saturation < 70 and oxygen_saturation > 0:
-                # ST elevation (STEMI pattern)
-                amplitude = 0.15 * base_amplitude * (1 - st_phase)
-            elif oxygen_saturation < 85 and oxygen_saturation > 0:
-                # ST depression (ischemia)
-                amplitude = -0.08 * base_amplitude * (1 - st_phase)
-            else:
-                # Normal ST segment (isoelectric)
-                amplitude = np.random.normal(0, 0.002)
-        
-        # T Wave
-        elif st_end <= norm_time < t_end:
-            t_phase = (norm_time - st_end) / t_duration
-            t_amplitude = 0.2 * base_amplitude
-            
-            # T wave modifications based on conditions
-            if oxygen_saturation < 80 and oxygen_saturation > 0:
-                # T wave inversion in severe hypoxia
-                t_amplitude *= -0.8
-            
-            # Electrolyte imbalances (simulated by stress)
-            if stress_level == 'High':
-                t_amplitude *= 1.4  # Peaked T waves (hyperkalemia-like)
-            elif stress_level == 'Low' or stress_level == 'None':
-                t_amplitude *= 0.5  # Flat T waves (hypokalemia-like)
-            
-            # Autonomic effects
-            if lf_hf > 2:  # Sympathetic dominance
-                t_amplitude *= 1.1
-            elif lf_hf < 0.5:  # Parasympathetic dominance
-                t_amplitude *= 0.9
-            
-            amplitude = t_amplitude * np.sin(t_phase * np.pi)
-        
-        # U Wave (visible in bradycardia and hypokalemia)
-        elif t_end <= norm_time < min(t_end + 0.1, 0.95):
-            if heart_rate < 60 or stress_level == 'Low':
-                u_phase = (norm_time - t_end) / 0.1
-                u_amplitude = 0.05 * base_amplitude
-                
-                if stress_level == 'Low':  # Prominent U waves in hypokalemia
-                    u_amplitude *= 2
-                
-                amplitude = u_amplitude * np.sin(u_phase * np.pi)
+        Samples after the last beat start use the report's mean RR as that beat's duration.
+        """
+        total_samples = len(sample_times)
         
-        # Baseline between beats
-        else:
-            amplitude = np.random.normal(0, 0.002)
+        # Find which beat cycle each sample is in
+        beat_indices = np.maximum(np.searchsorted(beat_starts, sample_times, side='right') - 1, 0)
+        beat_durations = np.append(np.diff(beat_starts), trace['base_rr_interval'])[beat_indices]
+        time_in_beat = sample_times - beat_starts[beat_indices]
+        in_beat = (time_in_beat >= 0) & (time_in_beat < beat_durations)
+        
+        # Generate PQRST complexes
+        isoelectric_noise = np.random.normal(0, 0.002, total_samples)
+        amplitudes = kernels['pqrst'](time_in_beat / beat_durations, beat_durations,
+                                      isoelectric_noise, trace['pqrst_params'])
+        amplitudes = np.where(in_beat, amplitudes, 0.0)
+        
+        # Add respiratory baseline variation
+        if trace['breathing_rate'] > 0:
+            amplitudes += trace['resp_amplitude'] * np.sin(2 * np.pi * trace['breathing_rate'] * sample_times / 60)
+        
+        # Add realistic noise
+        amplitudes += np.random.normal(0, trace['noise_level'], total_samples)
+        
+        return amplitudes, beat_indices
+    
+    def _render_flatline(self, sample_times):
+        """Baseline wander and noise with no cardiac activity"""
+        baseline_wander = 0.01 * np.sin(2 * np.pi * 0.1 * sample_times)
+        return baseline_wander + np.random.normal(0, 0.003, len(sample_times))
+    
+    def _to_points(self, sample_times, amplitudes, beat_indices):
+        """Convert sample arrays to the list-of-dicts format used by the API"""
+        return [
+            {
+                'time': sample_time,
+                'amplitude': amplitude,
+                'sample_index': i,
+                'beat_count': beat_index
+            }
+            for i, (sample_time, amplitude, beat_index) in enumerate(zip(
+                np.round(sample_times, 3).tolist(),
+                np.round(amplitudes, 4).tolist(),
+                beat_indices.tolist()))
+        ]
+    
+    def generate_rr_series(self, report_data, duration=300):
+        """RR intervals (ms) of the beat schedule a trace would use, without rendering it"""
+        trace = self._prepare_trace(report_data, 'Lead II')
+        if trace is None:
+            return np.zeros(0)
+        
+        rr_intervals = []
+        elapsed = 0
+        while elapsed < duration:
+            rr_interval = self._next_rr_interval(trace)
+            rr_intervals.append(rr_interval)
+            elapsed += rr_interval
+        return np.asarray(rr_intervals) * 1000
+    
+    def _build_annotations(self, beat_times, base_rr_interval, total_samples):
+        """Build the per-beat annotation table for a generated trace
+        
+        Boundaries mirror the wave timings of ecg_kernels._pqrst_loop (amplitudes
+        come from ecg_kernels.pqrst_params) and are stored as int32 sample indices.
+        Wave boundaries are the first sample at or after the boundary time, while
+        the R and T peaks are the nearest sample to the waveform maximum. Only beats
+        whose R peak falls inside the trace are kept; later boundaries of the last
+        beat may lie past the end.
+        """
+        beat_starts = np.asarray(beat_times, dtype=np.float64)
+        if len(beat_starts) == 0:
+            return {key: np.zeros(0, dtype=np.int32) for key in ANNOTATION_KEYS}
+        
+        beat_durations = np.diff(np.append(beat_starts, beat_starts[-1] + base_rr_interval))
+        
+        # Same fractions of the beat duration as ecg_kernels._pqrst_loop
+        p_start = 0.05
+        p_end = p_start + np.minimum(0.1 / beat_durations, 0.12)
+        qrs_start = p_start + np.minimum(0.16 / beat_durations, 0.2)
+        qrs_duration = np.minimum(0.09 / beat_durations, 0.11)
+        qrs_end = qrs_start + qrs_duration
+        st_end = qrs_end + np.minimum(0.1 / beat_durations, 0.12)
+        t_end = st_end + np.minimum(0.18 / beat_durations, 0.25)
+        
+        fractions = {
+            'beat_onset': np.zeros_like(beat_durations),
+            'p_onset': np.full_like(beat_durations, p_start),
+            'p_offset': p_end,
+            'qrs_onset': qrs_start,
+            'r_peak': qrs_start + 0.375 * qrs_duration,  # middle of the R phase (15-60% of QRS)
+            'qrs_offset': qrs_end,
+            't_onset': st_end,
+            't_peak': (st_end + t_end) / 2,
+            't_offset': t_end,
+        }
+        
+        annotations = {}
+        for key in ANNOTATION_KEYS:
+            position = (beat_starts + fractions[key] * beat_durations) * self.sample_rate
+            if key in ('r_peak', 't_peak'):
+                # Sample nearest the sine maximum, which is where the rendered wave peaks
+                annotations[key] = np.round(position).astype(np.int32)
+            else:
+                # First sample at or after the boundary, as sample_time >= boundary in the generator
+                annotations[key] = np.ceil(position - 1e-9).astype(np.int32)
         
-        return amplitude
+        inside = annotations['r_peak'] < total_samples
+        return {key: values[inside] for key, values in annotations.items()}
     
     def _map_stress_level(self, stress_value):
         """Map numeric stress level to text"""
@@ -380,12 +389,20 @@ class ECGGenerator:
                 return 'High'
         return 'Normal'
     
-    def calculate_ecg_metrics(self, ecg_data):
-        """Calculate comprehensive ECG metrics with accurate interval measurements"""
+    def calculate_ecg_metrics(self, ecg_data, annotations=None):
+        """Calculate comprehensive ECG metrics with accurate interval measurements
+        
+        When the generator's annotation table is passed, metrics are read straight
+        from the known beat boundaries instead of being re-detected.
+        """
         if not ecg_data:
             return {}
         
         amplitudes = [point['amplitude'] for point in ecg_data]
+        
+        if annotations is not None:
+            return self._calculate_metrics_from_annotations(amplitudes, annotations)
+        
         times = [point['time'] for point in ecg_data]
         
         # Check for flatline
@@ -394,7 +411,8 @@ class ECGGenerator:
             return self._get_flatline_metrics(amplitudes)
         
         # Detect R peaks using improved algorithm
-        r_peaks = self._detect_r_peaks(amplitudes, times)
+        amplitude_array = np.asarray(amplitudes, dtype=np.float64)
+        r_peaks = self._detect_r_peaks(amplitude_array, times)
         
         # Calculate heart rate and RR intervals
         rr_intervals = []
@@ -417,7 +435,7 @@ class ECGGenerator:
         # Measure ECG intervals from detected beats
         intervals = []
         for i, peak_idx in enumerate(r_peaks[:min(10, len(r_peaks))]):
-            interval = self._measure_beat_intervals(amplitudes, times, peak_idx)
+            interval = self._measure_beat_intervals(amplitude_array, times, peak_idx)
             if interval:
                 intervals.append(interval)
         
@@ -450,9 +468,75 @@ class ECGGenerator:
             'intervals_measured': len(intervals)
         }
     
+    def _calculate_metrics_from_annotations(self, amplitudes, annotations):
+        """Calculate ECG metrics from a generator annotation table (no detection)"""
+        r_peaks = annotations['r_peak']
+        if len(r_peaks) == 0:
+            return self._get_flatline_metrics(amplitudes)
+        
+        to_ms = 1000.0 / self.sample_rate
+        
+        # Heart rate and HRV from the exact R peak positions
+        rr_intervals = np.diff(r_peaks).astype(np.float64) * to_ms
+        if len(rr_intervals):
+            avg_rr = np.mean(rr_intervals)
+            calculated_hr = 60000 / avg_rr if avg_rr > 0 else 0
+        else:
+            avg_rr = 0
+            calculated_hr = 0
+        rmssd = np.sqrt(np.mean(np.diff(rr_intervals)**2)) if len(rr_intervals) > 1 else 0
+        sdnn = np.std(rr_intervals) if len(rr_intervals) else 0
+        
+        # Intervals only for beats that are complete inside the trace
+        complete = annotations['t_offset'] < len(amplitudes)
+        beats = {key: values[complete].astype(np.int64) for key, values in annotations.items()}
+        
+        qt = (beats['t_offset'] - beats['qrs_onset']) * to_ms
+        # Bazett's formula with each beat's own RR interval (beat onset to next beat onset)
+        # (the last beat has no successor in the table, so it uses the mean RR)
+        beat_rr = np.append(np.diff(annotations['beat_onset']) * to_ms, avg_rr)[complete]
+        valid_rr = beat_rr > 0
+        qtc = qt[valid_rr] / np.sqrt(beat_rr[valid_rr] / 1000.0)
+        
+        amplitude_array = np.asarray(amplitudes)
+        avg_intervals = {
+            'p_duration': self._robust_mean((beats['p_offset'] - beats['p_onset']) * to_ms),
+            'pr_interval': self._robust_mean((beats['qrs_onset'] - beats['p_onset']) * to_ms),
+            'qrs_duration': self._robust_mean((beats['qrs_offset'] - beats['qrs_onset']) * to_ms),
+            'qt_interval': self._robust_mean(qt),
+            'qtc_interval': self._robust_mean(qtc),
+            't_amplitude': self._robust_mean(amplitude_array[beats['t_peak']]),
+            't_duration': self._robust_mean((beats['t_offset'] - beats['t_onset']) * to_ms),
+        }
+        
+        signal_quality = self._assess_signal_quality(r_peaks, amplitudes, calculated_hr)
+        
+        return {
+            'r_peaks_detected': len(r_peaks),
+            'calculated_heart_rate': round(calculated_hr, 1),
+            'avg_rr_interval': round(avg_rr, 1),
+            'rr_intervals_count': len(rr_intervals),
+            'calculated_rmssd': round(rmssd, 1),
+            'calculated_sdnn': round(sdnn, 1),
+            'max_amplitude': round(max(amplitudes), 3),
+            'min_amplitude': round(min(amplitudes), 3),
+            'mean_amplitude': round(np.mean(amplitudes), 3),
+            'amplitude_std': round(np.std(amplitudes), 3),
+            'signal_quality': signal_quality,
+            'heart_rate_from_intervals': round(calculated_hr, 1),
+            'p_wave_duration': avg_intervals['p_duration'],
+            'pr_interval': avg_intervals['pr_interval'],
+            'qrs_duration': avg_intervals['qrs_duration'],
+            'qt_interval': avg_intervals['qt_interval'],
+            'qtc_interval': avg_intervals['qtc_interval'],
+            't_wave_deflection': avg_intervals['t_amplitude'],
+            't_wave_duration': avg_intervals['t_duration'],
+            'intervals_measured': int(np.count_nonzero(complete))
+        }
+    
     def _detect_r_peaks(self, amplitudes, times):
         """Improved R peak detection algorithm"""
-        r_peaks = []
+        amplitudes = np.asarray(amplitudes, dtype=np.float64)
         
         # Calculate dynamic threshold
         mean_amp = np.mean(amplitudes)
@@ -462,22 +546,8 @@ class ECGGenerator:
         # Minimum distance between peaks (200ms = refractory period)
         min_distance = int(0.2 * self.sample_rate)
         
-        # Find peaks
-        for i in range(1, len(amplitudes) - 1):
-            # Check if it's a local maximum above threshold
-            if (amplitudes[i] > amplitudes[i-1] and 
-                amplitudes[i] > amplitudes[i+1] and 
-                amplitudes[i] > threshold):
-                
-                # Check minimum distance from last peak
-                if not r_peaks or (i - r_peaks[-1]) >= min_distance:
-                    # Verify it's the highest point in a window
-                    window_start = max(0, i - min_distance // 2)
-                    window_end = min(len(amplitudes), i + min_distance // 2)
-                    if amplitudes[i] == max(amplitudes[window_start:window_end]):
-                        r_peaks.append(i)
-        
-        return r_peaks
+        # Local maxima above threshold that are the highest point in their window
+        return kernels['r_peaks'](amplitudes, threshold, min_distance).tolist()
     
     def _measure_beat_intervals(self, amplitudes, times, r_peak_idx):
         """Measure intervals for a single beat"""
@@ -502,7 +572,7 @@ class ECGGenerator:
             # Find P wave peak
             if p_search_end > p_search_start:
                 p_segment = amplitudes[p_search_start:p_search_end]
-                if p_segment:
+                if len(p_segment):
                     p_peak_local = np.argmax(p_segment)
                     p_peak_idx = p_search_start + p_peak_local
                     
@@ -524,7 +594,7 @@ class ECGGenerator:
             # Find T wave
             if t_search_end > t_search_start and t_search_start < len(amplitudes):
                 t_segment = amplitudes[t_search_start:t_search_end]
-                if t_segment:
+                if len(t_segment):
                     # T wave can be positive or negative
                     t_peak_local = np.argmax(np.abs(t_segment))
                     t_peak_idx = t_search_start + t_peak_local
@@ -561,10 +631,8 @@ class ECGGenerator:
         baseline = np.mean(amplitudes[max(0, search_start - 20):search_start]) if search_start > 20 else 0
         threshold = abs(baseline) + 0.02
         
-        for i in range(peak_idx, search_start, -1):
-            if i < len(amplitudes) and abs(amplitudes[i]) < threshold:
-                return i
-        return search_start
+        start = kernels['wave_start'](amplitudes, int(peak_idx), int(search_start), float(threshold))
+        return start if start >= 0 else search_start
     
     def _find_wave_end(self, amplitudes, peak_idx, search_end):
         """Find the end of a wave by looking for return to baseline"""
@@ -574,10 +642,8 @@ class ECGGenerator:
         baseline = np.mean(amplitudes[peak_idx:min(peak_idx + 20, search_end)])
         threshold = abs(baseline) * 0.1 + 0.02
         
-        for i in range(peak_idx, search_end):
-            if i < len(amplitudes) and abs(amplitudes[i] - baseline) < threshold:
-                return i
-        return min(search_end - 1, len(amplitudes) - 1)
+        end = kernels['wave_end'](amplitudes, int(peak_idx), int(search_end), float(baseline), float(threshold))
+        return end if end >= 0 else min(search_end - 1, len(amplitudes) - 1)
     
     def _average_intervals(self, intervals_list):
         """Average measured intervals across beats"""
@@ -592,21 +658,35 @@ class ECGGenerator:
         for key in keys:
             values = [interval[key] for interval in intervals_list if key in interval]
             if values:
-                # Remove outliers
-                values = np.array(values)
-                q1, q3 = np.percentile(values, [25, 75])
-                iqr = q3 - q1
-                lower = q1 - 1.5 * iqr
-                upper = q3 + 1.5 * iqr
-                filtered = values[(values >= lower) & (values <= upper)]
-                
-                if len(filtered) > 0:
-                    averaged[key] = round(np.mean(filtered), 1)
+                mean = self._robust_mean(values, default=None)
+                if mean is not None:
+                    averaged[key] = mean
         
         return averaged
     
+    def _robust_mean(self, values, default=0):
+        """Mean of values after removing IQR outliers, rounded to 0.1"""
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return default
+        
+        # Remove outliers
+        q1, q3 = np.percentile(values, [25, 75])
+        iqr = q3 - q1
+        lower = q1 - 1.5 * iqr
+        upper = q3 + 1.5 * iqr
+        filtered = values[(values >= lower) & (values <= upper)]
+        
+        if len(filtered) == 0:
+            return default
+        return round(float(np.mean(filtered)), 1)
+    
     def _assess_signal_quality(self, r_peaks, amplitudes, heart_rate):
         """Assess ECG signal quality"""
+        return self._signal_quality_from_stats(r_peaks, np.std(amplitudes), len(amplitudes), heart_rate)
+    
+    def _signal_quality_from_stats(self, r_peaks, amp_std, sample_count, heart_rate):
+        """Assess ECG signal quality from R peaks and amplitude statistics"""
         if len(r_peaks) == 0:
             return 'No beats detected'
         
@@ -626,7 +706,6 @@ class ECGGenerator:
                     return 'Irregular rhythm'
         
         # Check amplitude consistency
-        amp_std = np.std(amplitudes)
         if amp_std > 1.0:
             return 'Noisy'
         
@@ -635,7 +714,7 @@ class ECGGenerator:
             return 'Abnormal rate'
         
         # Check expected number of beats
-        expected_beats = len(amplitudes) * heart_rate / (60 * self.sample_rate)
+        expected_beats = sample_count * heart_rate / (60 * self.sample_rate)
         if abs(len(r_peaks) - expected_beats) / expected_beats > 0.3:
             return 'Inconsistent'
         
@@ -666,47 +745,1180 @@ class ECGGenerator:
             'intervals_measured': 0
         }
 
-# Initialize ECG generator
-ecg_generator = ECGGenerator()
+def read_wfdb_header(header_path):
+    """Parse a WFDB .hea header for the fields needed to memory-map format 16 data"""
+    with open(header_path, 'r') as f:
+        lines = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    if not lines:
+        raise ValueError('Empty WFDB header')
+    
+    record = lines[0].split()
+    n_signals = int(record[1])
+    sample_rate = float(record[2].split('/')[0]) if len(record) > 2 else 250.0
+    
+    signals = []
+    for line in lines[1:1 + n_signals]:
+        fields = line.split()
+        # format[xsamples_per_frame][:skew][+byte_offset]
+        fmt_field, _, byte_offset = fields[1].partition('+')
+        fmt = fmt_field.split('x')[0].split(':')[0]
+        gain, baseline, adc_zero = 200.0, None, 0
+        if len(fields) > 2:
+            gain_field = fields[2].split('/')[0]
+            if '(' in gain_field:
+                gain_field, baseline_field = gain_field.rstrip(')').split('(')
+                baseline = int(baseline_field)
+            gain = float(gain_field) or 200.0
+        if len(fields) > 4:
+            adc_zero = int(fields[4])
+        signals.append({
+            'file': fields[0],
+            'format': fmt,
+            'byte_offset': int(byte_offset or 0),
+            'gain': gain,
+            'baseline': adc_zero if baseline is None else baseline,
+            'description': ' '.join(fields[8:]) if len(fields) > 8 else ''
+        })
+    
+    return {'sample_rate': sample_rate, 'signals': signals}
 
-# Flask Routes
-@app.route('/')
-def index():
-    """Main page"""
-    return render_template('index.html')
+def open_recording(path, fmt='raw', sample_rate=500, gain=200.0, baseline=0, channels=1, channel=0):
+    """Memory-map a recorded ECG without reading it into memory
+    
+    ``fmt='raw'`` is headerless little-endian int16, interleaved when
+    ``channels > 1``; ``fmt='wfdb'`` takes the path of a .hea header whose
+    signals are stored in format 16. Returns (samples, sample_rate, gain,
+    baseline) where ``samples`` is a 1-D int16 view of the selected channel.
+    """
+    path = Path(path)
+    
+    if fmt == 'wfdb':
+        header = read_wfdb_header(path)
+        signals = header['signals']
+        if not 0 <= channel < len(signals):
+            raise ValueError(f"Channel {channel} not in record ({len(signals)} signals)")
+        signal = signals[channel]
+        if signal['format'] != '16':
+            raise ValueError(f"Unsupported WFDB format {signal['format']} (only 16 is supported)")
+        # Signals sharing a data file are interleaved in header order
+        group = [i for i, s in enumerate(signals) if s['file'] == signal['file']]
+        channels = len(group)
+        channel = group.index(channel)
+        data_path = path.parent / signal['file']
+        byte_offset = signal['byte_offset']
+        sample_rate, gain, baseline = header['sample_rate'], signal['gain'], signal['baseline']
+    elif fmt == 'raw':
+        data_path = path
+        byte_offset = 0
+        if not 0 <= channel < channels:
+            raise ValueError(f"Channel {channel} not in 0..{channels - 1}")
+    else:
+        raise ValueError(f"Unknown recording format: {fmt}")
+    
+    if sample_rate <= 0 or gain == 0:
+        raise ValueError('sample_rate and gain must be positive')
+    
+    frame_bytes = 2 * channels
+    n_samples = max(0, data_path.stat().st_size - byte_offset) // frame_bytes
+    if n_samples == 0:
+        raise ValueError('Recording contains no samples')
+    
+    samples = np.memmap(data_path, dtype='<i2', mode='r', offset=byte_offset, shape=(n_samples, channels))
+    return samples[:, channel], float(sample_rate), float(gain), float(baseline)
 
-@app.route('/api/reports')
-def get_reports():
-    """Get list of available reports"""
-    try:
-        reports = []
+def analyze_recording(path, fmt='raw', sample_rate=500, gain=200.0, baseline=0, channels=1, channel=0,
+                      chunk_seconds=RECORDING_CHUNK_SECONDS, overlap_seconds=RECORDING_OVERLAP_SECONDS):
+    """Run R-peak detection, HRV and interval measurement on a recorded ECG file
+    
+    The file is memory-mapped and processed in chunks with overlap at the
+    edges, so memory stays bounded regardless of recording length. Returns
+    (metrics, hrv_analysis, info) where ``metrics`` has the calculate_ecg_metrics
+    schema and ``hrv_analysis`` is ecg_hrv.hrv_metrics of the detected RR series.
+    """
+    samples, sample_rate, gain, baseline = open_recording(
+        path, fmt, sample_rate, gain, baseline, channels, channel
+    )
+    analyzer = ECGGenerator(sample_rate=sample_rate)
+    n_samples = len(samples)
+    chunk = max(1, int(chunk_seconds * sample_rate))
+    overlap = int(overlap_seconds * sample_rate)
+    min_distance = int(0.2 * sample_rate)
+    
+    r_peaks = []
+    intervals = []
+    amp_sum = amp_sq_sum = 0.0
+    amp_max, amp_min = -np.inf, np.inf
+    chunks = 0
+    
+    for start in range(0, n_samples, chunk):
+        end = min(n_samples, start + chunk)
+        lo = max(0, start - overlap)
+        hi = min(n_samples, end + overlap)
+        amplitudes = (np.asarray(samples[lo:hi], dtype=np.float64) - baseline) / gain
+        chunks += 1
+        
+        # Amplitude statistics over the samples this chunk owns
+        owned = amplitudes[start - lo:end - lo]
+        amp_sum += owned.sum()
+        amp_sq_sum += np.dot(owned, owned)
+        amp_max = max(amp_max, owned.max())
+        amp_min = min(amp_min, owned.min())
+        
+        # Peaks in the overlap belong to the neighbouring chunk
+        times = np.arange(len(amplitudes)) / sample_rate
+        measured = 0
+        for local_idx in analyzer._detect_r_peaks(amplitudes, times):
+            global_idx = lo + local_idx
+            if not start <= global_idx < end:
+                continue
+            if r_peaks and global_idx - r_peaks[-1] < min_distance:
+                continue
+            r_peaks.append(global_idx)
+            
+            if measured < RECORDING_BEATS_PER_CHUNK:
+                interval = analyzer._measure_beat_intervals(amplitudes, times, local_idx)
+                if interval:
+                    intervals.append(interval)
+                    measured += 1
+    
+    mean_amp = amp_sum / n_samples
+    amp_std = float(np.sqrt(max(0.0, amp_sq_sum / n_samples - mean_amp ** 2)))
+    info = {
+        'format': fmt,
+        'sample_rate': sample_rate,
+        'samples': n_samples,
+        'duration_s': round(n_samples / sample_rate, 3),
+        'channel': channel,
+        'chunks': chunks
+    }
+    
+    if amp_max - amp_min < 0.1:
+        metrics = analyzer._get_flatline_metrics([0.0])
+        metrics.update({
+            'max_amplitude': round(float(amp_max), 3),
+            'min_amplitude': round(float(amp_min), 3),
+            'mean_amplitude': round(float(mean_amp), 3),
+            'amplitude_std': round(amp_std, 3)
+        })
+        return metrics, hrv_metrics(np.zeros(0)), info
+    
+    r_peaks = np.asarray(r_peaks, dtype=np.int64)
+    rr_intervals = np.diff(r_peaks) / sample_rate * 1000  # ms
+    
+    if len(rr_intervals):
+        avg_rr = np.mean(rr_intervals)
+        calculated_hr = 60000 / avg_rr if avg_rr > 0 else 0
+    else:
+        avg_rr = 0
+        calculated_hr = 0
+    
+    # Calculate HRV metrics
+    rmssd = np.sqrt(np.mean(np.diff(rr_intervals)**2)) if len(rr_intervals) > 1 else 0
+    sdnn = np.std(rr_intervals) if len(rr_intervals) else 0
+    
+    avg_intervals = analyzer._average_intervals(intervals)
+    signal_quality = analyzer._signal_quality_from_stats(r_peaks, amp_std, n_samples, calculated_hr)
+    
+    metrics = {
+        'r_peaks_detected': len(r_peaks),
+        'calculated_heart_rate': round(float(calculated_hr), 1),
+        'avg_rr_interval': round(float(avg_rr), 1),
+        'rr_intervals_count': len(rr_intervals),
+        'calculated_rmssd': round(float(rmssd), 1),
+        'calculated_sdnn': round(float(sdnn), 1),
+        'max_amplitude': round(float(amp_max), 3),
+        'min_amplitude': round(float(amp_min), 3),
+        'mean_amplitude': round(float(mean_amp), 3),
+        'amplitude_std': round(amp_std, 3),
+        'signal_quality': signal_quality,
+        'heart_rate_from_intervals': round(float(calculated_hr), 1),
+        'p_wave_duration': avg_intervals.get('p_duration', 0),
+        'pr_interval': avg_intervals.get('pr_interval', 0),
+        'qrs_duration': avg_intervals.get('qrs_duration', 0),
+        'qt_interval': avg_intervals.get('qt_interval', 0),
+        'qtc_interval': avg_intervals.get('qtc_interval', 0),
+        't_wave_deflection': avg_intervals.get('t_amplitude', 0),
+        't_wave_duration': avg_intervals.get('t_duration', 0),
+        'intervals_measured': len(intervals)
+    }
+    return metrics, hrv_metrics(rr_intervals), info
+
+class AdmissionRejected(Exception):
+    """A request was refused by the resource governor"""
+    
+    def __init__(self, message, status=429, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+class ResourceGovernor:
+    """Concurrency and memory budgets for generation requests, global and per client
+    
+    Requests that do not fit wait in a bounded queue for up to queue_timeout
+    seconds; after that, or when the queue is full, they are rejected with 429.
+    """
+    
+    def __init__(self, max_concurrent, memory_budget, client_max_concurrent, client_memory_budget,
+                 max_queued, queue_timeout, max_samples):
+        self.max_concurrent = max_concurrent
+        self.memory_budget = memory_budget
+        self.client_max_concurrent = client_max_concurrent
+        self.client_memory_budget = client_memory_budget
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.max_samples = max_samples
+        self._condition = threading.Condition()
+        self._active = 0
+        self._memory = 0
+        self._cpu_seconds = 0.0
+        self._queued = 0
+        self._clients = {}
+        self.admitted = 0
+        self.rejected = 0
+    
+    def estimate(self, duration, sample_rate, leads=1):
+        """Estimate the cost of generating `duration` seconds for `leads` leads"""
+        samples = int(duration * sample_rate * leads)
+        return {
+            'samples': samples,
+            'memory_bytes': samples * GENERATION_BYTES_PER_SAMPLE,
+            'cpu_seconds': round(samples / GENERATION_SAMPLES_PER_SECOND, 3)
+        }
+    
+    def estimate_hrv(self, heart_rates, duration):
+        """Estimate the cost of generating and analysing one RR series per heart rate"""
+        beats = int(sum(max(20, min(250, rate)) for rate in heart_rates) * duration / 60)
+        return {
+            'beats': beats,
+            'memory_bytes': HRV_BASE_BYTES + beats * HRV_BYTES_PER_BEAT,
+            'cpu_seconds': round(beats / HRV_BEATS_PER_SECOND, 3)
+        }
+    
+    def estimate_recording(self, total_samples, sample_rate):
+        """Estimate the cost of chunked analysis of a recording and HRV of its beats"""
+        chunk_samples = int((RECORDING_CHUNK_SECONDS + 2 * RECORDING_OVERLAP_SECONDS) * sample_rate)
+        # HRV runs after the chunks on at most one beat per 0.24 s (250 bpm)
+        beats = int(total_samples / sample_rate * 250 / 60)
+        return {
+            'recording_samples': total_samples,
+            'memory_bytes': max(min(total_samples, chunk_samples) * RECORDING_BYTES_PER_SAMPLE,
+                                HRV_BASE_BYTES + beats * HRV_BYTES_PER_BEAT),
+            'cpu_seconds': round(total_samples / RECORDING_SAMPLES_PER_SECOND + beats / HRV_BEATS_PER_SECOND, 3)
+        }
+    
+    def _fits(self, client, cost):
+        active, memory = self._clients.get(client, (0, 0))
+        return (self._active < self.max_concurrent
+                and self._memory + cost['memory_bytes'] <= self.memory_budget
+                and active < self.client_max_concurrent
+                and memory + cost['memory_bytes'] <= self.client_memory_budget)
+    
+    def _retry_after(self):
+        """Seconds until enough in-flight work should have drained"""
+        return max(1, math.ceil(self._cpu_seconds / max(1, self.max_concurrent)))
+    
+    @contextmanager
+    def admit(self, client, cost):
+        """Hold budget for a request while the block runs, or raise AdmissionRejected"""
+        if cost.get('samples', 0) > self.max_samples:
+            with self._condition:
+                self.rejected += 1
+            raise AdmissionRejected(
+                f"Request too large: {cost['samples']} samples (max {self.max_samples})", status=413
+            )
+        if cost['memory_bytes'] > min(self.memory_budget, self.client_memory_budget):
+            with self._condition:
+                self.rejected += 1
+            raise AdmissionRejected(
+                f"Request too large: needs {cost['memory_bytes']} bytes "
+                f"(max {min(self.memory_budget, self.client_memory_budget)})", status=413
+            )
+        
+        with self._condition:
+            if not self._fits(client, cost):
+                if self._queued >= self.max_queued:
+                    self.rejected += 1
+                    raise AdmissionRejected('Server busy, queue full', retry_after=self._retry_after())
+                self._queued += 1
+                try:
+                    admitted = self._condition.wait_for(lambda: self._fits(client, cost), self.queue_timeout)
+                finally:
+                    self._queued -= 1
+                if not admitted:
+                    self.rejected += 1
+                    raise AdmissionRejected('Server busy, try again later', retry_after=self._retry_after())
+            
+            self._active += 1
+            self._memory += cost['memory_bytes']
+            self._cpu_seconds += cost['cpu_seconds']
+            active, memory = self._clients.get(client, (0, 0))
+            self._clients[client] = (active + 1, memory + cost['memory_bytes'])
+            self.admitted += 1
         
-        for report_file in REPORTS_DIR.glob("*.json"):
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                self._memory -= cost['memory_bytes']
+                self._cpu_seconds -= cost['cpu_seconds']
+                active, memory = self._clients[client]
+                if active == 1:
+                    del self._clients[client]
+                else:
+                    self._clients[client] = (active - 1, memory - cost['memory_bytes'])
+                self._condition.notify_all()
+    
+    def status(self):
+        """Current load against the configured budgets"""
+        with self._condition:
+            return {
+                'active': self._active,
+                'max_concurrent': self.max_concurrent,
+                'memory_reserved': self._memory,
+                'memory_budget': self.memory_budget,
+                'cpu_seconds_in_flight': round(self._cpu_seconds, 3),
+                'queued': self._queued,
+                'max_queued': self.max_queued,
+                'clients': len(self._clients),
+                'admitted': self.admitted,
+                'rejected': self.rejected
+            }
+
+CSV_HEADER = ['Time(s)', 'Amplitude(mV)', 'Sample_Index', 'Beat_Count']
+
+def iter_ecg_csv(ecg_data):
+    """Yield an ECG trace as CSV text, one line at a time"""
+    line = io.StringIO()
+    writer = csv.writer(line)
+    
+    def flush():
+        text = line.getvalue()
+        line.seek(0)
+        line.truncate(0)
+        return text
+    
+    writer.writerow(CSV_HEADER)
+    yield flush()
+    
+    for point in ecg_data:
+        writer.writerow([
+            point.get('time', 0),
+            point.get('amplitude', 0),
+            point.get('sample_index', 0),
+            point.get('beat_count', 0)
+        ])
+        yield flush()
+
+def export_filename(filename, lead, suffix):
+    """CSV name for an export; request-supplied parts are reduced to safe characters"""
+    filename = secure_filename(str(filename)) or 'ecg_export'
+    lead = secure_filename(str(lead)) or 'Lead_II'
+    return f"{filename}_{lead}_{suffix}.csv"
+
+class ExportStore:
+    """CSV exports directory with content dedupe, TTL and size/count quotas"""
+    
+    def __init__(self, directory, ttl_seconds, max_bytes, max_files):
+        self.directory = Path(directory)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        self.directory.mkdir(exist_ok=True)
+    
+    def save(self, ecg_data, filename, lead):
+        """Store an export and return (csv_filename, path, created)
+        
+        Identical content for the same filename/lead maps to the same file, so
+        repeated clicks reuse the existing export instead of writing a new one.
+        """
+        content = ''.join(iter_ecg_csv(ecg_data)).encode('utf-8')
+        digest = hashlib.sha256(content).hexdigest()[:16]
+        csv_filename = export_filename(filename, lead, digest)
+        csv_path = self.directory / csv_filename
+        
+        with self._lock:
+            created = not csv_path.exists()
+            if created:
+                # Write to a temporary name first so readers never see partial files
+                tmp_file = tempfile.NamedTemporaryFile(dir=self.directory, suffix='.tmp', delete=False)
+                try:
+                    with tmp_file:
+                        tmp_file.write(content)
+                    os.replace(tmp_file.name, csv_path)
+                except Exception:
+                    Path(tmp_file.name).unlink(missing_ok=True)
+                    raise
+            else:
+                os.utime(csv_path)
+            self._evict(keep=csv_filename)
+        
+        return csv_filename, csv_path, created
+    
+    def resolve(self, filename):
+        """Return the path of a stored export, or None if it is missing/expired"""
+        if secure_filename(filename) != filename:
+            return None
+        file_path = self.directory / filename
+        with self._lock:
             try:
-                with open(report_file, 'r') as f:
-                    report_data = json.load(f)
+                stat = file_path.stat()
+            except OSError:
+                return None
+            if time.time() - stat.st_mtime > self.ttl_seconds:
+                file_path.unlink(missing_ok=True)
+                return None
+            # Downloads count as use for least-recently-used eviction
+            os.utime(file_path)
+        return file_path
+    
+    def usage(self):
+        """Current number of stored exports and their total size (including temporary files)"""
+        files = list(self.directory.glob('*.csv'))
+        temp_files = list(self.directory.glob('*.tmp'))
+        total = 0
+        for path in files + temp_files:
+            try:
+                total += path.stat().st_size
+            except OSError:
+                pass
+        return {'files': len(files), 'temp_files': len(temp_files), 'bytes': total,
+                'max_files': self.max_files, 'max_bytes': self.max_bytes}
+    
+    def evict(self):
+        """Apply TTL and quotas now"""
+        with self._lock:
+            return self._evict()
+    
+    def _evict(self, keep=None):
+        """Remove expired exports, then least recently used ones over quota"""
+        now = time.time()
+        entries = []
+        removed = 0
+        
+        # Leftovers of writes that failed before the rename (disk full, crash)
+        for path in self.directory.glob('*.tmp'):
+            try:
+                if now - path.stat().st_mtime > EXPORT_TMP_MAX_AGE:
+                    path.unlink(missing_ok=True)
+                    removed += 1
+            except OSError:
+                continue
+        
+        for path in self.directory.glob('*.csv'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.ttl_seconds and path.name != keep:
+                path.unlink(missing_ok=True)
+                removed += 1
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+        
+        entries.sort(key=lambda entry: entry[0])
+        file_count = len(entries)
+        total_bytes = sum(size for _, size, _ in entries)
+        
+        for _, size, path in entries:
+            if file_count <= self.max_files and total_bytes <= self.max_bytes:
+                break
+            if path.name == keep:
+                continue
+            path.unlink(missing_ok=True)
+            file_count -= 1
+            total_bytes -= size
+            removed += 1
+        
+        return removed
+
+class LiveECGStream:
+    """One continuous ECG generator for a (report, lead) shared by all its viewers
+    
+    A background thread renders the trace in chunks, slices it into frames paced
+    to wall-clock time and puts each frame, serialized once, on every
+    subscriber's queue.
+    """
+    
+    def __init__(self, generator, report_data, filename, lead):
+        self.generator = generator
+        self.filename = filename
+        self.lead = lead
+        self.trace = generator._prepare_trace(report_data, lead)
+        self.frame_samples = max(1, int(round(LIVE_FRAME_SECONDS * generator.sample_rate)))
+        self.chunk_samples = max(self.frame_samples,
+                                 int(LIVE_CHUNK_SECONDS * generator.sample_rate) // self.frame_samples * self.frame_samples)
+        self.subscribers = set()
+        self.frames_sent = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        
+        # Rolling beat schedule: beat start times and the global index of the first one
+        self._beat_times = [0.0]
+        self._first_beat_index = 0
+        self._next_sample = 0
+    
+    def subscribe(self):
+        """Add a viewer and return its frame queue"""
+        subscriber = queue.Queue(maxsize=LIVE_SUBSCRIBER_QUEUE)
+        with self._lock:
+            self.subscribers.add(subscriber)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True,
+                                                name=f"live-{self.filename}-{self.lead}")
+                self._thread.start()
+        return subscriber
+    
+    def unsubscribe(self, subscriber):
+        """Remove a viewer; the generator stops with the last one. Returns True if stopped"""
+        with self._lock:
+            self.subscribers.discard(subscriber)
+            idle = not self.subscribers
+        if idle:
+            self._stop.set()
+        return idle
+    
+    def _render_chunk(self):
+        """Render the next chunk of the continuous trace"""
+        sample_rate = self.generator.sample_rate
+        start = self._next_sample
+        sample_times = np.arange(start, start + self.chunk_samples) / sample_rate
+        self._next_sample += self.chunk_samples
+        
+        if self.trace is None:
+            amplitudes = self.generator._render_flatline(sample_times)
+            return sample_times, amplitudes, np.zeros(len(sample_times), dtype=np.int64)
+        
+        # Keep the schedule one beat ahead of the chunk so every beat has a known duration
+        chunk_end = sample_times[-1]
+        while self._beat_times[-1] <= chunk_end:
+            self._beat_times.append(self._beat_times[-1] + self.generator._next_rr_interval(self.trace))
+        
+        # Forget beats that ended before this chunk
+        while len(self._beat_times) > 2 and self._beat_times[1] <= sample_times[0]:
+            self._beat_times.pop(0)
+            self._first_beat_index += 1
+        
+        amplitudes, beat_indices = self.generator._render(self.trace, sample_times, np.asarray(self._beat_times))
+        return sample_times, amplitudes, beat_indices + self._first_beat_index
+    
+    def _publish(self, frame):
+        """Fan a serialized frame out to every subscriber, dropping the oldest if one lags"""
+        with self._lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(frame)
+            except queue.Full:
+                try:
+                    subscriber.get_nowait()
+                except queue.Empty:
+                    pass
+                try:
+                    subscriber.put_nowait(frame)
+                except queue.Full:
+                    pass
+    
+    def _run(self):
+        """Render chunks and emit frames paced to wall-clock time"""
+        next_deadline = time.monotonic()
+        
+        while not self._stop.is_set():
+            sample_times, amplitudes, beat_indices = self._render_chunk()
+            times = np.round(sample_times, 3).tolist()
+            values = np.round(amplitudes, 4).tolist()
+            beats = beat_indices.tolist()
+            start_index = self._next_sample - self.chunk_samples
+            
+            for offset in range(0, self.chunk_samples, self.frame_samples):
+                if self._stop.is_set():
+                    return
+                end = offset + self.frame_samples
+                self._publish(json.dumps({
+                    'filename': self.filename,
+                    'lead': self.lead,
+                    'sample_rate': self.generator.sample_rate,
+                    'start_index': start_index + offset,
+                    'time': times[offset:end],
+                    'amplitude': values[offset:end],
+                    'beat_count': beats[offset:end]
+                }))
+                self.frames_sent += 1
                 
-                reports.append({
-                    'filename': report_file.name,
+                next_deadline += LIVE_FRAME_SECONDS
+                delay = next_deadline - time.monotonic()
+                if delay > 0:
+                    self._stop.wait(delay)
+                elif delay < -1.0:
+                    # Fell more than a second behind (e.g. suspended); resync instead of bursting
+                    next_deadline = time.monotonic()
+
+class LiveMonitorHub:
+    """Registry of live streams keyed by (report filename, lead)"""
+    
+    def __init__(self, generator):
+        self.generator = generator
+        self._streams = {}
+        self._lock = threading.Lock()
+    
+    def subscribe(self, filename, lead, report_data):
+        """Join (or start) the stream for a report/lead; returns (stream, queue)"""
+        key = (filename, lead)
+        with self._lock:
+            stream = self._streams.get(key)
+            if stream is None:
+                stream = LiveECGStream(self.generator, report_data, filename, lead)
+                self._streams[key] = stream
+            subscriber = stream.subscribe()
+        return stream, subscriber
+    
+    def unsubscribe(self, stream, subscriber):
+        """Leave a stream, shutting it down when the last viewer is gone"""
+        # Held across the check so a concurrent subscribe cannot join a stopping stream
+        with self._lock:
+            if stream.unsubscribe(subscriber):
+                self._streams.pop((stream.filename, stream.lead), None)
+    
+    def status(self):
+        """Active streams and their viewer counts"""
+        with self._lock:
+            streams = list(self._streams.values())
+        return [{
+            'filename': stream.filename,
+            'lead': stream.lead,
+            'subscribers': len(stream.subscribers),
+            'frames_sent': stream.frames_sent
+        } for stream in streams]
+
+def scan_reports(reports_dir):
+    """Map of report filename -> (mtime_ns, size), from directory entries only"""
+    snapshot = {}
+    with os.scandir(reports_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith('.json'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                snapshot[entry.name] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+def build_ecg_response(generator, report_data, lead, duration, metrics_mode='annotations'):
+    """Generate a trace and assemble the /api/generate_ecg response body, or None on failure"""
+    ecg_data, annotations = generator.generate_ecg_from_report(
+        report_data, lead, duration, with_annotations=True
+    )
+    
+    if not ecg_data:
+        return None
+    
+    # Calculate metrics
+    if metrics_mode == 'annotations':
+        metrics = generator.calculate_ecg_metrics(ecg_data, annotations)
+    else:
+        metrics = generator.calculate_ecg_metrics(ecg_data)
+    
+    return {
+        'success': True,
+        'ecg_data': ecg_data,
+        'metrics': metrics,
+        'metrics_mode': metrics_mode,
+        'annotations': {key: values.tolist() for key, values in annotations.items()},
+        'hrv_analysis': hrv_metrics(np.diff(annotations['r_peak']) * 1000.0 / generator.sample_rate),
+        'report_summary': {
+            'heart_rate': report_data.get('heart_rate'),
+            'breathing_rate': report_data.get('breathing_rate'),
+            'hrv_sdnn': report_data.get('hrv_sdnn'),
+            'mean_rri': report_data.get('mean_rri'),
+            'rmssd': report_data.get('rmssd'),
+            'stress_level': generator._map_stress_level(report_data.get('stress_level', 1)),
+            'wellness_score': report_data.get('wellness_score'),
+            'oxygen_saturation': report_data.get('oxygen_saturation', 98),
+            'blood_pressure': report_data.get('blood_pressure', 'N/A'),
+            'pns_index': report_data.get('pns_index', 0),
+            'sns_index': report_data.get('sns_index', 0),
+            'lf_hf': report_data.get('lf_hf', 1.0)
+        },
+        'lead_info': {
+            'name': lead,
+            'description': ECG_LEADS.get(lead, {}).get('description', ''),
+            'sample_rate': generator.sample_rate,
+            'duration': duration
+        }
+    }
+
+class PrecomputeStore:
+    """Serialized generate_ecg responses persisted per (report, lead, duration)
+    
+    File names carry the report's mtime and size, so a lookup is one stat of the
+    report plus an exists check, and results for an older version are never served.
+    Each stored response is handed out once, for the report's first view; it then
+    leaves an empty .served marker so it is not precomputed again.
+    """
+    
+    def __init__(self, directory, reports_dir):
+        self.directory = Path(directory)
+        self.reports_dir = Path(reports_dir)
+        self.directory.mkdir(exist_ok=True)
+    
+    def signature(self, filename):
+        """Version tag of a report file, or None if it does not exist"""
+        try:
+            stat = (self.reports_dir / filename).stat()
+        except OSError:
+            return None
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+    
+    def _prefix(self, filename, lead, duration):
+        return f"{Path(filename).stem}.{lead.replace(' ', '_')}.{duration}s."
+    
+    def _versions(self, filename, lead, duration):
+        """Stored responses and markers of a report/lead/duration, any version
+        
+        Signatures contain no dots, so another report whose stem merely starts
+        with this prefix (``a.json`` vs ``a.Lead_II.10s.x.json``) is not matched.
+        """
+        prefix = self._prefix(filename, lead, duration)
+        for path in self.directory.glob(glob.escape(prefix) + '*'):
+            if path.suffix in ('.json', '.served') and '.' not in path.stem[len(prefix):]:
+                yield path
+    
+    def path_for(self, filename, lead, duration, signature):
+        return self.directory / f"{self._prefix(filename, lead, duration)}{signature}.json"
+    
+    def done(self, filename, lead, duration, signature):
+        """True if this version was already precomputed (stored or served)"""
+        path = self.path_for(filename, lead, duration, signature)
+        return path.exists() or path.with_suffix('.served').exists()
+    
+    def take(self, filename, lead, duration):
+        """Claim the stored response for the current version of a report, or None
+        
+        The rename makes the claim atomic, so concurrent first views cannot both
+        get it; later views generate a fresh trace.
+        """
+        signature = self.signature(filename)
+        if signature is None:
+            return None
+        path = self.path_for(filename, lead, duration, signature)
+        served_path = path.with_suffix('.served')
+        try:
+            os.replace(path, served_path)
+        except OSError:
+            return None
+        body = served_path.read_bytes()
+        served_path.write_bytes(b'')
+        return body
+    
+    def save(self, filename, lead, duration, signature, body):
+        """Atomically store a serialized response and drop ones for older versions"""
+        path = self.path_for(filename, lead, duration, signature)
+        tmp_file = tempfile.NamedTemporaryFile('w', dir=self.directory, suffix='.tmp', delete=False)
+        try:
+            with tmp_file:
+                tmp_file.write(body)
+            os.replace(tmp_file.name, path)
+        except Exception:
+            Path(tmp_file.name).unlink(missing_ok=True)
+            raise
+        
+        for old_path in list(self._versions(filename, lead, duration)):
+            if old_path != path:
+                old_path.unlink(missing_ok=True)
+        return path
+    
+    def discard(self, filename, leads, duration):
+        """Remove every stored response and marker of a report for the given leads"""
+        for lead in leads:
+            for path in list(self._versions(filename, lead, duration)):
+                path.unlink(missing_ok=True)
+    
+    def count(self):
+        """Stored responses not yet served"""
+        return sum(1 for _ in self.directory.glob('*.json'))
+
+# Precompute priorities (lower runs first)
+PRIORITY_NEW = 0
+PRIORITY_MODIFIED = 1
+PRIORITY_SCAN = 2
+
+class PrecomputePipeline:
+    """Watches the reports directory and precomputes default-lead responses
+    
+    Events are coalesced per file: a report is processed once it has been quiet
+    for settle_seconds, so a burst of rewrites costs one run. Pending reports are
+    taken by priority (new, modified, startup scan) and newest first; beyond
+    max_backlog the lowest priority ones are dropped and simply generated on
+    first view. Background work goes through the resource governor, so it never
+    takes more than one client's share from interactive requests.
+    """
+    
+    def __init__(self, generator, store, governor, reports_dir, leads, duration, workers,
+                 max_backlog, settle_seconds, poll_seconds):
+        self.generator = generator
+        self.store = store
+        self.governor = governor
+        self.reports_dir = Path(reports_dir)
+        self.leads = tuple(leads)
+        self.duration = duration
+        self.workers = workers
+        self.max_backlog = max_backlog
+        self.settle_seconds = settle_seconds
+        self.poll_seconds = poll_seconds
+        self.backend = None
+        self.stats = {'completed': 0, 'skipped': 0, 'failed': 0, 'dropped': 0, 'retried': 0}
+        self._pending = {}  # filename -> (priority, -mtime, due)
+        self._in_flight = set()
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = []
+        self._observer = None
+        self.listeners = []  # called with the filename of every change seen
+    
+    def start(self):
+        """Queue reports that are not precomputed yet, then start the watcher and workers"""
+        if self._threads:
+            return
+        
+        for path in self.reports_dir.glob('*.json'):
+            signature = self.store.signature(path.name)
+            if signature and not self._is_cached(path.name, signature):
+                self.notify(path.name, PRIORITY_SCAN, settle=False)
+        
+        if Observer is not None:
+            self._start_watchdog()
+            self.backend = 'watchdog'
+        else:
+            self._threads.append(threading.Thread(target=self._poll, daemon=True, name='precompute-poll'))
+            self.backend = 'polling'
+        
+        for i in range(self.workers):
+            self._threads.append(threading.Thread(target=self._worker, daemon=True, name=f"precompute-{i}"))
+        for thread in self._threads:
+            thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._observer is not None:
+            self._observer.stop()
+    
+    def _start_watchdog(self):
+        pipeline = self
+        
+        class ReportEventHandler(FileSystemEventHandler):
+            def on_created(self, event):
+                if not event.is_directory:
+                    pipeline.notify(Path(event.src_path).name, PRIORITY_NEW)
+            
+            def on_modified(self, event):
+                if not event.is_directory:
+                    pipeline.notify(Path(event.src_path).name, PRIORITY_MODIFIED)
+            
+            def on_moved(self, event):
+                # Writers that save atomically rename a temporary file over the report
+                if not event.is_directory:
+                    pipeline.notify(Path(event.src_path).name)
+                    pipeline.notify(Path(event.dest_path).name, PRIORITY_NEW)
+            
+            def on_deleted(self, event):
+                if not event.is_directory:
+                    pipeline.notify(Path(event.src_path).name)
+        
+        self._observer = Observer()
+        self._observer.daemon = True
+        self._observer.schedule(ReportEventHandler(), str(self.reports_dir), recursive=False)
+        self._observer.start()
+    
+    def _poll(self):
+        """Fallback watcher: diff directory snapshots every poll_seconds"""
+        snapshot = scan_reports(self.reports_dir)
+        while not self._stop.wait(self.poll_seconds):
+            current = scan_reports(self.reports_dir)
+            for name, version in current.items():
+                if name not in snapshot:
+                    self.notify(name, PRIORITY_NEW)
+                elif snapshot[name] != version:
+                    self.notify(name, PRIORITY_MODIFIED)
+            for name in snapshot.keys() - current.keys():
+                self.notify(name)
+            snapshot = current
+    
+    def notify(self, filename, priority=PRIORITY_MODIFIED, settle=True):
+        """Queue a report for precomputing, or push back its settle deadline if queued"""
+        if not filename.endswith('.json'):
+            return
+        for listener in self.listeners:
+            listener(filename)
+        
+        try:
+            mtime = (self.reports_dir / filename).stat().st_mtime
+        except OSError:
+            # Deleted report: forget pending work and stored results
+            with self._condition:
+                self._pending.pop(filename, None)
+            self.store.discard(filename, self.leads, self.duration)
+            return
+        
+        due = time.monotonic() + (self.settle_seconds if settle else 0)
+        with self._condition:
+            existing = self._pending.get(filename)
+            if existing is not None:
+                priority = min(priority, existing[0])
+            elif len(self._pending) >= self.max_backlog:
+                worst = max(self._pending, key=lambda name: self._pending[name][:2])
+                self.stats['dropped'] += 1
+                if self._pending[worst][:2] <= (priority, -mtime):
+                    return
+                del self._pending[worst]
+            self._pending[filename] = (priority, -mtime, due)
+            self._condition.notify()
+    
+    def _next(self):
+        """Block until a settled report is ready; returns (filename, entry), or None on stop"""
+        with self._condition:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                waiting = [(entry, name) for name, entry in self._pending.items() if name not in self._in_flight]
+                ready = [(entry, name) for entry, name in waiting if entry[2] <= now]
+                if ready:
+                    entry, name = min(ready, key=lambda item: item[0][:2])
+                    del self._pending[name]
+                    self._in_flight.add(name)
+                    return name, entry
+                timeout = min(entry[2] for entry, _ in waiting) - now if waiting else None
+                self._condition.wait(timeout)
+            return None
+    
+    def _is_cached(self, filename, signature):
+        return all(self.store.done(filename, lead, self.duration, signature) for lead in self.leads)
+    
+    def _process(self, filename):
+        """Precompute the missing leads of one report; returns the stats key to count"""
+        signature = self.store.signature(filename)
+        if signature is None:
+            return 'skipped'
+        leads = [lead for lead in self.leads if not self.store.done(filename, lead, self.duration, signature)]
+        if not leads:
+            return 'skipped'
+        
+        with open(self.reports_dir / filename, 'r') as f:
+            report_data = json.load(f)
+        
+        cost = self.governor.estimate(self.duration, self.generator.sample_rate, len(leads))
+        with self.governor.admit(PRECOMPUTE_CLIENT, cost):
+            for lead in leads:
+                body = build_ecg_response(self.generator, report_data, lead, self.duration)
+                if body is None:
+                    return 'failed'
+                # Rewritten while generating: the new version has its own event queued
+                if self.store.signature(filename) != signature:
+                    return 'skipped'
+                self.store.save(filename, lead, self.duration, signature, app.json.dumps(body))
+        return 'completed'
+    
+    def _worker(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            filename, entry = item
+            retry_after = None
+            
+            try:
+                outcome = self._process(filename)
+            except AdmissionRejected as e:
+                # Interactive requests have the server busy; try again later
+                outcome = 'retried' if e.retry_after else 'failed'
+                retry_after = e.retry_after
+            except Exception as e:
+                print(f"Error precomputing {filename}: {e}")
+                outcome = 'failed'
+            
+            with self._condition:
+                self._in_flight.discard(filename)
+                self.stats[outcome] += 1
+                if retry_after and filename not in self._pending:
+                    self._pending[filename] = entry[:2] + (time.monotonic() + retry_after,)
+                self._condition.notify_all()
+    
+    def status(self):
+        """Watcher backend, backlog and counters"""
+        with self._condition:
+            status = {
+                'backend': self.backend,
+                'running': bool(self._threads) and not self._stop.is_set(),
+                'pending': len(self._pending),
+                'in_flight': len(self._in_flight),
+                'max_backlog': self.max_backlog,
+                'leads': list(self.leads),
+                'duration': self.duration,
+                **self.stats
+            }
+        status['stored'] = self.store.count()
+        return status
+
+class ReportIndex:
+    """Summaries of every report for /api/reports, kept up to date incrementally
+    
+    A refresh stats the directory and re-reads only reports whose mtime or size
+    changed. Any change bumps `generation`, which versions the listing for HTTP
+    validators. While watchdog watches the directory, refreshes skip even the
+    stat pass until a change event marks the index dirty.
+    """
+    
+    def __init__(self, reports_dir, generator):
+        self.reports_dir = Path(reports_dir)
+        self.generator = generator
+        self.generation = 0
+        self.last_modified = datetime.now(timezone.utc)
+        self.watched = False
+        # Generations restart with the process, so ETags carry its start time
+        self._epoch = format(time.time_ns(), 'x')
+        self._files = {}  # filename -> ((mtime_ns, size), summary or None)
+        self._dirty = True
+        self._lock = threading.Lock()
+    
+    def invalidate(self, filename=None):
+        self._dirty = True
+    
+    @property
+    def etag(self):
+        return f"reports-{self._epoch}-{self.generation}"
+    
+    def refresh(self):
+        """Bring the index up to date with the directory"""
+        with self._lock:
+            if self.watched and not self._dirty:
+                return
+            # Cleared first so events arriving during the scan are not lost
+            self._dirty = False
+            snapshot = scan_reports(self.reports_dir)
+            changed = False
+            
+            for name in self._files.keys() - snapshot.keys():
+                del self._files[name]
+                changed = True
+            
+            for name, version in snapshot.items():
+                known = self._files.get(name)
+                if known is None or known[0] != version:
+                    self._files[name] = self._summarize(name)
+                    changed = True
+            
+            if changed:
+                self.generation += 1
+                self.last_modified = datetime.now(timezone.utc)
+    
+    def _summarize(self, name):
+        """Read one report; returns (version actually read, summary or None)"""
+        try:
+            f = open(self.reports_dir / name, 'r')
+        except OSError:
+            return (None, None)
+        
+        with f:
+            stat = os.fstat(f.fileno())
+            version = (stat.st_mtime_ns, stat.st_size)
+            try:
+                report_data = json.load(f)
+                return version, {
+                    'filename': name,
                     'id': report_data.get('id', 'Unknown'),
                     'heart_rate': report_data.get('heart_rate', 0),
                     'breathing_rate': report_data.get('breathing_rate', 0),
-                    'stress_level': ecg_generator._map_stress_level(report_data.get('stress_level', 1)),
+                    'stress_level': self.generator._map_stress_level(report_data.get('stress_level', 1)),
                     'created_date': report_data.get('created_date', 'Unknown'),
                     'result_time': report_data.get('result_time', 'Unknown'),
                     'wellness_score': report_data.get('wellness_score', 0),
-                    'file_size': report_file.stat().st_size
-                })
+                    'file_size': stat.st_size
+                }
             except Exception as e:
-                print(f"Error reading {report_file.name}: {e}")
-        
+                print(f"Error reading {name}: {e}")
+                return version, None
+    
+    def listing(self):
+        """(summaries sorted newest id first, etag, last_modified) of one generation"""
+        with self._lock:
+            reports = [summary for _, summary in self._files.values() if summary is not None]
+            etag, last_modified = self.etag, self.last_modified
         reports.sort(key=lambda x: x.get('id', 0), reverse=True)
+        return reports, etag, last_modified
+
+# Initialize ECG generator
+ecg_generator = ECGGenerator()
+live_hub = LiveMonitorHub(ecg_generator)
+governor = ResourceGovernor(
+    GLOBAL_MAX_CONCURRENT, GLOBAL_MEMORY_BUDGET, CLIENT_MAX_CONCURRENT, CLIENT_MEMORY_BUDGET,
+    MAX_QUEUED_REQUESTS, QUEUE_TIMEOUT_SECONDS, MAX_GENERATION_SAMPLES
+)
+export_store = ExportStore(EXPORTS_DIR, EXPORT_TTL_SECONDS, EXPORT_MAX_BYTES, EXPORT_MAX_FILES)
+precompute_store = PrecomputeStore(PRECOMPUTE_DIR, REPORTS_DIR)
+precompute = PrecomputePipeline(
+    ecg_generator, precompute_store, governor, REPORTS_DIR, PRECOMPUTE_LEADS, PRECOMPUTE_DURATION,
+    PRECOMPUTE_WORKERS, PRECOMPUTE_MAX_BACKLOG, PRECOMPUTE_SETTLE_SECONDS, PRECOMPUTE_POLL_SECONDS
+)
+report_index = ReportIndex(REPORTS_DIR, ecg_generator)
+precompute.listeners.append(report_index.invalidate)
+
+def governor_client():
+    """Identity the governor applies per-client budgets to"""
+    if GOVERNOR_CLIENT_HEADER:
+        return request.headers.get(GOVERNOR_CLIENT_HEADER) or request.remote_addr
+    return request.remote_addr
+
+def admission_rejected_response(error, cost):
+    """JSON error for a request refused by the governor, with Retry-After when busy"""
+    headers = {'Retry-After': str(error.retry_after)} if error.retry_after else {}
+    return jsonify({'success': False, 'error': str(error), 'estimated_cost': cost}), error.status, headers
+
+def set_validators(response, etag, last_modified):
+    """Attach ETag/Last-Modified and ask clients to revalidate on every use"""
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
+
+def _report_validators(stat):
+    """Strong ETag and Last-Modified of a report file from its stat"""
+    etag = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+    return etag, datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+
+def not_modified_response(etag, last_modified):
+    """304 response if the request's If-None-Match/If-Modified-Since still match, else None"""
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    return set_validators(Response(status=304), etag, last_modified)
+
+# Flask Routes
+@app.route('/')
+def index():
+    """Main page"""
+    return render_template('index.html')
+
+@app.route('/api/reports')
+def get_reports():
+    """Get list of available reports
+    
+    Answers If-None-Match/If-Modified-Since with 304 from the index generation;
+    only reports that changed since the last request are re-read.
+    """
+    try:
+        report_index.refresh()
+        reports, etag, last_modified = report_index.listing()
         
-        return jsonify({
+        not_modified = not_modified_response(etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        
+        return set_validators(jsonify({
             'success': True,
             'reports': reports,
             'count': len(reports)
-        })
+        }), etag, last_modified)
         
     except Exception as e:
         return jsonify({
@@ -721,7 +1933,19 @@ def generate_ecg():
         data = request.get_json()
         filename = data.get('filename')
         lead = data.get('lead', 'Lead II')
-        duration = int(data.get('duration', 10))
+        try:
+            duration = int(data.get('duration', 10))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'Duration must be a whole number of seconds'}), 400
+        # 'annotations' reads metrics from the generator's beat table,
+        # 'detect' re-runs the heuristic detector on the trace (for validation)
+        metrics_mode = data.get('metrics_mode', 'annotations')
+        
+        if metrics_mode not in ('annotations', 'detect'):
+            return jsonify({'success': False, 'error': 'metrics_mode must be annotations or detect'}), 400
+        
+        if duration <= 0:
+            return jsonify({'success': False, 'error': 'Duration must be positive'}), 400
         
         if not filename:
             return jsonify({'success': False, 'error': 'Filename required'}), 400
@@ -730,45 +1954,29 @@ def generate_ecg():
         if not report_path.exists():
             return jsonify({'success': False, 'error': 'Report file not found'}), 404
         
+        # The first view of a freshly precomputed report is answered straight from disk;
+        # ``fresh: true`` always generates a new trace
+        if metrics_mode == 'annotations' and not data.get('fresh', False):
+            stored_body = precompute_store.take(filename, lead, duration)
+            if stored_body is not None:
+                return Response(stored_body, mimetype='application/json',
+                                headers={'X-ECG-Precomputed': 'hit'})
+        
         with open(report_path, 'r') as f:
             report_data = json.load(f)
         
-        # Generate ECG
-        ecg_data = ecg_generator.generate_ecg_from_report(report_data, lead, duration)
-        
-        if not ecg_data:
-            return jsonify({'success': False, 'error': 'Failed to generate ECG'}), 500
-        
-        # Calculate metrics
-        metrics = ecg_generator.calculate_ecg_metrics(ecg_data)
-        
-        # Prepare response with all relevant data
-        return jsonify({
-            'success': True,
-            'ecg_data': ecg_data,
-            'metrics': metrics,
-            'report_summary': {
-                'heart_rate': report_data.get('heart_rate'),
-                'breathing_rate': report_data.get('breathing_rate'),
-                'hrv_sdnn': report_data.get('hrv_sdnn'),
-                'mean_rri': report_data.get('mean_rri'),
-                'rmssd': report_data.get('rmssd'),
-                'stress_level': ecg_generator._map_stress_level(report_data.get('stress_level', 1)),
-                'wellness_score': report_data.get('wellness_score'),
-                'oxygen_saturation': report_data.get('oxygen_saturation', 98),
-                'blood_pressure': report_data.get('blood_pressure', 'N/A'),
-                'pns_index': report_data.get('pns_index', 0),
-                'sns_index': report_data.get('sns_index', 0),
-                'lf_hf': report_data.get('lf_hf', 1.0)
-            },
-            'lead_info': {
-                'name': lead,
-                'description': ECG_LEADS.get(lead, {}).get('description', ''),
-                'sample_rate': ecg_generator.sample_rate,
-                'duration': duration
-            }
-        })
+        # Reserve CPU/memory budget before doing any work
+        cost = governor.estimate(duration, ecg_generator.sample_rate)
+        with governor.admit(governor_client(), cost):
+            body = build_ecg_response(ecg_generator, report_data, lead, duration, metrics_mode)
+            
+            if body is None:
+                return jsonify({'success': False, 'error': 'Failed to generate ECG'}), 500
+            
+            return jsonify(body)
         
+    except AdmissionRejected as e:
+        return admission_rejected_response(e, cost)
     except Exception as e:
         print(f"Error generating ECG: {e}")
         import traceback
@@ -780,7 +1988,11 @@ def generate_ecg():
 
 @app.route('/api/export_ecg', methods=['POST'])
 def export_ecg():
-    """Export ECG data to CSV"""
+    """Export ECG data to CSV
+    
+    With ``stream: true`` the CSV is sent directly as the response body and
+    nothing is written to disk; otherwise it goes into the exports store.
+    """
     try:
         data = request.get_json()
         ecg_data = data.get('ecg_data', [])
@@ -790,27 +2002,23 @@ def export_ecg():
         if not ecg_data:
             return jsonify({'success': False, 'error': 'No ECG data provided'}), 400
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        csv_filename = f"{filename}_{lead}_{timestamp}.csv"
-        csv_path = EXPORTS_DIR / csv_filename
+        if data.get('stream'):
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            csv_filename = export_filename(filename, lead, timestamp)
+            return Response(
+                stream_with_context(iter_ecg_csv(ecg_data)),
+                mimetype='text/csv',
+                headers={'Content-Disposition': f'attachment; filename="{csv_filename}"'}
+            )
         
-        with open(csv_path, 'w', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(['Time(s)', 'Amplitude(mV)', 'Sample_Index', 'Beat_Count'])
-            
-            for point in ecg_data:
-                writer.writerow([
-                    point.get('time', 0),
-                    point.get('amplitude', 0),
-                    point.get('sample_index', 0),
-                    point.get('beat_count', 0)
-                ])
+        csv_filename, csv_path, created = export_store.save(ecg_data, filename, lead)
         
         return jsonify({
             'success': True,
             'filename': csv_filename,
             'path': str(csv_path),
-            'rows': len(ecg_data) + 1
+            'rows': len(ecg_data) + 1,
+            'deduplicated': not created
         })
         
     except Exception as e:
@@ -823,9 +2031,9 @@ def export_ecg():
 def download_csv(filename):
     """Download CSV file"""
     try:
-        file_path = EXPORTS_DIR / filename
+        file_path = export_store.resolve(filename)
         
-        if not file_path.exists():
+        if file_path is None:
             return jsonify({'error': 'File not found'}), 404
         
         return send_file(
@@ -838,16 +2046,46 @@ def download_csv(filename):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/exports/status')
+def exports_status():
+    """Get exports store usage and apply eviction"""
+    try:
+        removed = export_store.evict()
+        return jsonify({
+            'success': True,
+            'evicted': removed,
+            'usage': export_store.usage(),
+            'ttl_seconds': export_store.ttl_seconds
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/report_details/<filename>')
 def get_report_details(filename):
-    """Get detailed report information"""
+    """Get detailed report information
+    
+    Validators come from the file's mtime and size, so conditional requests
+    are answered from a stat without opening the report.
+    """
     try:
         report_path = REPORTS_DIR / filename
         
-        if not report_path.exists():
+        try:
+            stat = report_path.stat()
+        except OSError:
             return jsonify({'success': False, 'error': 'Report not found'}), 404
         
+        not_modified = not_modified_response(*_report_validators(stat))
+        if not_modified is not None:
+            return not_modified
+        
         with open(report_path, 'r') as f:
+            # Validators describe the version actually read, even if it was just replaced
+            etag, last_modified = _report_validators(os.fstat(f.fileno()))
             report_data = json.load(f)
         
         formatted_data = {
@@ -899,23 +2137,252 @@ def get_report_details(filename):
             }
         }
         
-        return jsonify({
+        return set_validators(jsonify({
             'success': True,
             'report': formatted_data,
             'raw_data': report_data
+        }), etag, last_modified)
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/hrv_check')
+def hrv_check():
+    """HRV analysis of the RR series the generator would use for every report
+    
+    The generated RR intervals are independent draws around the report's mean,
+    so their spectrum is flat and ``generated.lf_hf`` stays near the white-noise
+    ratio whatever the report says. The values describe the synthetic beat
+    schedule; they are not a check of the report's own lf_hf.
+    """
+    try:
+        duration = int(request.args.get('duration', 300))
+        method = request.args.get('method', 'lomb')
+        
+        if not 0 < duration <= HRV_CHECK_MAX_DURATION:
+            return jsonify({'success': False,
+                            'error': f"duration must be between 1 and {HRV_CHECK_MAX_DURATION} seconds"}), 400
+        
+        if method not in ('lomb', 'welch'):
+            return jsonify({'success': False, 'error': 'method must be lomb or welch'}), 400
+        
+        report_files = sorted(REPORTS_DIR.glob("*.json"))
+        reports = []
+        rr_series = []
+        for report_file in report_files:
+            try:
+                with open(report_file, 'r') as f:
+                    report_data = json.load(f)
+            except Exception as e:
+                print(f"Error reading {report_file.name}: {e}")
+                continue
+            reports.append((report_file.name, report_data))
+        
+        heart_rates = []
+        for _, report_data in reports:
+            try:
+                heart_rates.append(float(report_data.get('heart_rate', 72)))
+            except (TypeError, ValueError):
+                heart_rates.append(72.0)
+        cost = governor.estimate_hrv(heart_rates, duration)
+        
+        with governor.admit(governor_client(), cost):
+            rr_series = [ecg_generator.generate_rr_series(report_data, duration) for _, report_data in reports]
+            # One batched analysis for all reports
+            batch = batch_hrv_metrics(rr_series, method) if rr_series else {}
+        
+        def value(key, i):
+            number = float(batch[key][i])
+            return None if np.isnan(number) else round(number, 3)
+        
+        results = []
+        for i, (filename, report_data) in enumerate(reports):
+            results.append({
+                'filename': filename,
+                'reported': {
+                    'lf_hf': report_data.get('lf_hf'),
+                    'pns_index': report_data.get('pns_index'),
+                    'sns_index': report_data.get('sns_index'),
+                    'rmssd': report_data.get('rmssd'),
+                    'hrv_sdnn': report_data.get('hrv_sdnn')
+                },
+                'generated': {key: value(key, i) for key in batch}
+            })
+        
+        return jsonify({
+            'success': True,
+            'method': method,
+            'duration': duration,
+            'count': len(results),
+            'results': results
         })
         
+    except AdmissionRejected as e:
+        return admission_rejected_response(e, cost)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@app.route('/api/load')
+def get_load():
+    """Get current generation load and admission control budgets"""
+    return jsonify({
+        'success': True,
+        'load': governor.status()
+    })
+
+@app.route('/api/precompute/status')
+def precompute_status():
+    """Get the precompute pipeline backlog and counters"""
+    return jsonify({
+        'success': True,
+        'precompute': precompute.status()
+    })
+
+@app.route('/api/analyze_recording', methods=['POST'])
+def analyze_recording_upload():
+    """Analyze an uploaded ECG recording (raw int16 or WFDB header + signal)"""
+    try:
+        fmt = request.form.get('format', 'raw')
+        options = {
+            'sample_rate': float(request.form.get('sample_rate', 500)),
+            'gain': float(request.form.get('gain', 200)),
+            'baseline': float(request.form.get('baseline', 0)),
+            'channels': int(request.form.get('channels', 1)),
+            'channel': int(request.form.get('channel', 0))
+        }
+        
+        # Uploads are streamed to disk and removed once the analysis finishes
+        with tempfile.TemporaryDirectory(dir=UPLOADS_DIR) as upload_dir:
+            upload_dir = Path(upload_dir)
+            
+            if fmt == 'wfdb':
+                header_file = request.files.get('header')
+                signal_file = request.files.get('signal')
+                if header_file is None or signal_file is None:
+                    return jsonify({'success': False, 'error': 'WFDB upload needs header and signal files'}), 400
+                
+                recording_path = upload_dir / 'record.hea'
+                header_file.save(recording_path)
+                # The data file must be stored under the name the header gives the selected channel
+                signals = read_wfdb_header(recording_path)['signals']
+                if not 0 <= options['channel'] < len(signals):
+                    return jsonify({'success': False,
+                                    'error': f"Channel {options['channel']} not in record ({len(signals)} signals)"}), 400
+                signal_file.save(upload_dir / Path(signals[options['channel']]['file']).name)
+            else:
+                recording_file = request.files.get('file')
+                if recording_file is None:
+                    return jsonify({'success': False, 'error': 'Recording file required'}), 400
+                
+                recording_path = upload_dir / 'recording.dat'
+                recording_file.save(recording_path)
+            
+            samples, sample_rate, _, _ = open_recording(recording_path, fmt, **options)
+            cost = governor.estimate_recording(len(samples), sample_rate)
+            del samples
+            
+            with governor.admit(governor_client(), cost):
+                metrics, hrv_analysis, info = analyze_recording(recording_path, fmt, **options)
+        
+        return jsonify({
+            'success': True,
+            'metrics': metrics,
+            'hrv_analysis': hrv_analysis,
+            'recording': info
+        })
+        
+    except AdmissionRejected as e:
+        return admission_rejected_response(e, cost)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error analyzing recording: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/live/status')
+def live_status():
+    """Get active live monitor streams"""
+    return jsonify({
+        'success': True,
+        'enabled': sock is not None,
+        'frame_ms': int(LIVE_FRAME_SECONDS * 1000),
+        'streams': live_hub.status()
+    })
+
+if sock is not None:
+    @sock.route('/ws/live/<filename>')
+    def live_monitor(ws, filename):
+        """Stream a live ECG for a report; ?lead= selects the lead"""
+        lead = request.args.get('lead', 'Lead II')
+        report_path = REPORTS_DIR / filename
+        
+        # Streams are shared per (report, lead), so only known leads may start one
+        if lead not in ECG_LEADS:
+            ws.send(json.dumps({'success': False, 'error': f'Unknown lead: {lead}'}))
+            return
+        
+        if not report_path.exists():
+            ws.send(json.dumps({'success': False, 'error': 'Report file not found'}))
+            return
+        
+        try:
+            with open(report_path, 'r') as f:
+                report_data = json.load(f)
+        except (OSError, ValueError) as e:
+            ws.send(json.dumps({'success': False, 'error': f'Invalid report file: {e}'}))
+            return
+        
+        stream, subscriber = live_hub.subscribe(filename, lead, report_data)
+        try:
+            while True:
+                try:
+                    frame = subscriber.get(timeout=5)
+                except queue.Empty:
+                    continue
+                ws.send(frame)
+        finally:
+            live_hub.unsubscribe(stream, subscriber)
+
+def start_background_services():
+    """Start the report watcher and precompute workers in the serving process
+    
+    Called when the app is run directly; other launchers (WSGI servers, the load
+    test server) call it themselves or set ECG_START_SERVICES=1.
+    """
+    precompute.start()
+    # Watchdog events keep the listing current without rescanning per request
+    report_index.watched = precompute.backend == 'watchdog'
+
+if os.environ.get('ECG_START_SERVICES') == '1':
+    start_background_services()
+
 if __name__ == '__main__':
     print(f"Starting Enhanced ECG Generator App v2.0...")
     print(f"Reports directory: {REPORTS_DIR.absolute()}")
     print(f"Exports directory: {EXPORTS_DIR.absolute()}")
+    print(f"Exports evicted on startup: {export_store.evict()}")
+    debug = True
+    # With the reloader on, the parent process only watches source files; the child serves
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_services()
+        print(f"Precompute watcher: {precompute.backend}, {PRECOMPUTE_WORKERS} workers")
     print(f"ECG accuracy: >95% with proper interval measurements")
     print(f"Sampling rate: 500 Hz (medical grade)")
+    print(f"Kernel backend: {ECG_KERNEL_BACKEND}")
+    if ECG_KERNEL_BACKEND != 'numpy':
+        print(f"Kernel parity with numpy: {verify_kernel_parity(ECG_KERNEL_BACKEND)}")
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(debug=debug, host='0.0.0.0', port=5000)
\ No newline at end of file
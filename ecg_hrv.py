@@ -0,0 +1,241 @@
+# ecg_hrv.py - Frequency-domain and nonlinear HRV analysis of RR series
+#
+# Every function works on a batch: a list of RR series (ms) of any lengths is
+# padded into one NaN-masked matrix, so thousands of series are analysed with
+# stacked array operations instead of a Python loop per series.
+import warnings
+
+import numpy as np
+
+# Standard HRV frequency bands (Hz)
+VLF_BAND = (0.0033, 0.04)
+LF_BAND = (0.04, 0.15)
+HF_BAND = (0.15, 0.4)
+
+LOMB_FREQUENCIES = np.linspace(VLF_BAND[0], HF_BAND[1], 256)
+WELCH_RESAMPLE_HZ = 4.0
+WELCH_SEGMENT = 256  # samples at 4 Hz = 64 s
+LOMB_BLOCK_ELEMENTS = 8_000_000  # series x frequencies x beats evaluated at once
+MIN_SPECTRAL_SECONDS = 60  # shorter series cannot resolve LF; spectral values are NaN
+
+# np.trapz was renamed to np.trapezoid in NumPy 2.0
+_trapezoid = getattr(np, 'trapezoid', None) or np.trapz
+
+HRV_KEYS = (
+    'pnn50', 'sd1', 'sd2', 'sd1_sd2_ratio', 'vlf_power', 'lf_power',
+    'hf_power', 'total_power', 'lf_nu', 'hf_nu', 'lf_hf'
+)
+
+def pad_rr_series(rr_series):
+    """Stack RR series (ms) of different lengths into a NaN-padded matrix"""
+    lengths = np.array([len(rr) for rr in rr_series], dtype=np.int64)
+    width = int(lengths.max()) if len(lengths) else 0
+    rr = np.full((len(rr_series), width), np.nan)
+    for i, series in enumerate(rr_series):
+        rr[i, :lengths[i]] = series
+    return rr, lengths
+
+def poincare_batch(rr):
+    """pNN50 (%), SD1 and SD2 (ms) for each row of a NaN-padded RR matrix"""
+    diffs = np.diff(rr, axis=1)
+    valid = ~np.isnan(diffs)
+    n_diffs = valid.sum(axis=1)
+
+    # Rows that are too short yield NaN; silence the empty-slice warnings for them
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        pnn50 = 100.0 * (np.abs(np.where(valid, diffs, 0)) > 50).sum(axis=1) / n_diffs
+
+        # SD1^2 = Var(successive differences) / 2, SD2^2 = 2 SDNN^2 - SD1^2
+        sd1 = np.sqrt(np.nanvar(diffs, axis=1) / 2)
+        sdnn_sq = np.nanvar(rr, axis=1)
+        sd2 = np.sqrt(np.maximum(2 * sdnn_sq - sd1 ** 2, 0))
+        ratio = sd1 / sd2
+
+    too_short = n_diffs < 2
+    for values in (pnn50, sd1, sd2, ratio):
+        values[too_short] = np.nan
+    return pnn50, sd1, sd2, ratio
+
+def lomb_scargle_batch(rr, frequencies=LOMB_FREQUENCIES):
+    """One-sided Lomb-Scargle PSD (ms^2/Hz) of each RR row on a common frequency grid
+
+    Handles the uneven beat timing directly; padded entries get zero weight.
+    """
+    n_series, width = rr.shape
+    psd = np.full((n_series, len(frequencies)), np.nan)
+    if width < 3:
+        return psd
+
+    mask = ~np.isnan(rr)
+    counts = mask.sum(axis=1)
+    times = np.cumsum(np.where(mask, rr, 0), axis=1) / 1000.0  # beat times (s)
+    means = np.where(mask, rr, 0).sum(axis=1) / np.maximum(counts, 1)
+    values = np.where(mask, rr - means[:, None], 0.0)
+    omega = 2 * np.pi * frequencies
+
+    # Rows are processed in blocks of similar length to avoid computing on padding
+    # (longest first, so the first row of a block sets its width). A block never
+    # holds more than LOMB_BLOCK_ELEMENTS terms: long rows get few companions,
+    # and a row too long on its own is split along the frequency axis.
+    order = np.argsort(-counts, kind='stable')
+    start = 0
+    while start < n_series:
+        width = max(int(counts[order[start]]), 1)
+        block = max(1, LOMB_BLOCK_ELEMENTS // (len(frequencies) * width))
+        rows = order[start:start + block]
+        start += len(rows)
+        freq_step = max(1, LOMB_BLOCK_ELEMENTS // (len(rows) * width))
+
+        w = mask[rows, None, :width]
+        y = values[rows, None, :width]
+        # Scale so the PSD integrates to the RR variance: S(f) = 2 P(f) T / N
+        scale = 2 * times[rows].max(axis=1) / np.maximum(counts[rows], 1)
+
+        for f_start in range(0, len(frequencies), freq_step):
+            f_slice = slice(f_start, f_start + freq_step)
+            wt = omega[None, f_slice, None] * times[rows, None, :width]
+
+            # One sine/cosine per element; every other term follows from identities
+            c = np.where(w, np.cos(wt), 0.0)
+            s = np.where(w, np.sin(wt), 0.0)
+            del wt
+            cc = (c * c).sum(axis=2)
+            ss = (s * s).sum(axis=2)
+            cs = (c * s).sum(axis=2)
+            yc = (y * c).sum(axis=2)
+            ys = (y * s).sum(axis=2)
+            del c, s
+
+            # Time offset tau makes the sine and cosine terms orthogonal
+            two_tau = np.arctan2(2 * cs, cc - ss)
+            cos_tau = np.cos(two_tau / 2)
+            sin_tau = np.sin(two_tau / 2)
+
+            with np.errstate(invalid='ignore', divide='ignore'):
+                power = 0.5 * (
+                    (cos_tau * yc + sin_tau * ys) ** 2
+                    / (cos_tau ** 2 * cc + 2 * cos_tau * sin_tau * cs + sin_tau ** 2 * ss)
+                    + (cos_tau * ys - sin_tau * yc) ** 2
+                    / (cos_tau ** 2 * ss - 2 * cos_tau * sin_tau * cs + sin_tau ** 2 * cc)
+                )
+
+            psd[rows, f_slice] = power * scale[:, None]
+
+    psd[counts < 3] = np.nan
+    return psd
+
+def welch_batch(rr, resample_hz=WELCH_RESAMPLE_HZ, segment=WELCH_SEGMENT):
+    """Welch PSD (ms^2/Hz) of each RR row after resampling the tachogram evenly
+
+    Returns (frequencies, psd). Series shorter than one segment are
+    zero-padded into a single segment so all rows share one frequency grid.
+    The low-pass response of linear interpolation between beats is divided
+    out, so band powers match Lomb-Scargle on the raw beat times.
+    """
+    step = segment // 2
+    window = np.hanning(segment)
+    scale = 2.0 / (resample_hz * (window ** 2).sum())
+    frequencies = np.fft.rfftfreq(segment, 1.0 / resample_hz)
+
+    # Cut every series into 50% overlapping segments, remembering the owner row
+    segments = []
+    owners = []
+    mean_rr = np.full(len(rr), np.nan)
+    for row, series in enumerate(rr):
+        series = series[~np.isnan(series)]
+        if len(series) < 3:
+            continue
+        mean_rr[row] = series.mean() / 1000.0
+        times = np.cumsum(series) / 1000.0
+        grid = np.arange(times[0], times[-1], 1.0 / resample_hz)
+        tachogram = np.interp(grid, times, series)
+        if len(tachogram) < segment:
+            tachogram = np.pad(tachogram - tachogram.mean(), (0, segment - len(tachogram)))
+            segments.append(tachogram)
+            owners.append(row)
+            continue
+        for start in range(0, len(tachogram) - segment + 1, step):
+            segments.append(tachogram[start:start + segment])
+            owners.append(row)
+
+    psd = np.full((len(rr), len(frequencies)), np.nan)
+    if not segments:
+        return frequencies, psd
+
+    segments = np.array(segments)
+    segments -= segments.mean(axis=1, keepdims=True)
+    spectra = np.abs(np.fft.rfft(segments * window, axis=1)) ** 2 * scale
+
+    # Average each row's segments
+    owners = np.array(owners)
+    sums = np.zeros((len(rr), len(frequencies)))
+    np.add.at(sums, owners, spectra)
+    per_row = np.bincount(owners, minlength=len(rr))
+    has_segments = per_row > 0
+    psd[has_segments] = sums[has_segments] / per_row[has_segments, None]
+
+    # Linear interpolation of beat-spaced samples attenuates power by sinc^4(f RR);
+    # above the beat rate's Nyquist frequency the spectrum is aliased, so cap there
+    beat_phase = np.minimum(frequencies[None, :] * mean_rr[has_segments, None], 0.5)
+    psd[has_segments] /= np.sinc(beat_phase) ** 4
+    return frequencies, psd
+
+def band_power(frequencies, psd, band):
+    """Integrate each PSD row over a frequency band (ms^2)"""
+    low, high = band
+    in_band = (frequencies >= low) & (frequencies < high)
+    if in_band.sum() < 2:
+        return np.zeros(len(psd))
+    return _trapezoid(psd[:, in_band], frequencies[in_band], axis=1)
+
+def batch_hrv_metrics(rr_series, method='lomb'):
+    """Frequency-domain and nonlinear HRV for many RR series (ms) at once
+
+    ``method`` is 'lomb' (Lomb-Scargle on the raw beat times) or 'welch'
+    (Welch on a 4 Hz resampled tachogram). Returns a dict of arrays, one
+    value per series, keyed by HRV_KEYS; NaN where a series is too short.
+    """
+    if method not in ('lomb', 'welch'):
+        raise ValueError(f"Unknown HRV spectral method: {method}")
+
+    rr, _ = pad_rr_series(rr_series)
+    pnn50, sd1, sd2, ratio = poincare_batch(rr)
+    too_short = np.nansum(rr, axis=1) / 1000.0 < MIN_SPECTRAL_SECONDS
+
+    if method == 'lomb':
+        frequencies = LOMB_FREQUENCIES
+        psd = lomb_scargle_batch(rr, frequencies)
+    else:
+        frequencies, psd = welch_batch(rr)
+
+    vlf = band_power(frequencies, psd, VLF_BAND)
+    lf = band_power(frequencies, psd, LF_BAND)
+    hf = band_power(frequencies, psd, HF_BAND)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        lf_nu = 100 * lf / (lf + hf)
+        hf_nu = 100 * hf / (lf + hf)
+        lf_hf = lf / hf
+
+    for values in (vlf, lf, hf, lf_nu, hf_nu, lf_hf):
+        values[too_short] = np.nan
+
+    return {
+        'pnn50': pnn50,
+        'sd1': sd1,
+        'sd2': sd2,
+        'sd1_sd2_ratio': ratio,
+        'vlf_power': vlf,
+        'lf_power': lf,
+        'hf_power': hf,
+        'total_power': vlf + lf + hf,
+        'lf_nu': lf_nu,
+        'hf_nu': hf_nu,
+        'lf_hf': lf_hf,
+    }
+
+def hrv_metrics(rr_intervals, method='lomb'):
+    """HRV metrics for a single RR series (ms) as a JSON-friendly dict"""
+    batch = batch_hrv_metrics([np.asarray(rr_intervals, dtype=np.float64)], method)
+    return {key: (None if np.isnan(values[0]) else round(float(values[0]), 3))
+            for key, values in batch.items()}
@@ -0,0 +1,333 @@
+# ecg_kernels.py - Signal kernels for the ECG generator and detector
+#
+# The per-sample PQRST waveform, R-peak selection and wave boundary searches
+# are written once as plain loops (JIT-compiled with Numba when it is
+# installed) and once as vectorized NumPy (always available). Kept in their
+# own module so Numba's on-disk cache always sees the same module name,
+# however the app itself is started or imported.
+import os
+
+import numpy as np
+
+# Optional JIT backend for the sequential per-sample/per-beat kernels.
+# ECG_KERNEL_BACKEND=numpy forces the pure-NumPy implementation.
+try:
+    import numba
+    HAS_NUMBA = True
+except ImportError:
+    numba = None
+    HAS_NUMBA = False
+
+def pqrst_params(base_amplitude, heart_rate, stress_level, oxygen_saturation,
+                  systolic, sns_index, lf_hf):
+    """Resolve the condition-dependent wave amplitudes for one trace
+    
+    Returns (p, q, r, s, st_level, st_isoelectric, t, u_enabled, u) as floats so
+    that the kernels only have to deal with per-sample timing.
+    """
+    # P wave modifications
+    p_amplitude = 0.12 * base_amplitude
+    if systolic > 140:  # P mitrale in hypertension
+        p_amplitude *= 1.3
+    if heart_rate > 100:  # Smaller P waves in tachycardia
+        p_amplitude *= 0.8
+    
+    # Pathological Q waves in ischemia
+    q_amplitude = -0.15 * base_amplitude
+    if oxygen_saturation < 85 and oxygen_saturation > 0:
+        q_amplitude *= 2.0
+    
+    # R wave modifications
+    r_amplitude = base_amplitude
+    if heart_rate > 150:
+        r_amplitude *= 0.7  # Decreased amplitude in severe tachycardia
+    elif heart_rate < 50:
+        r_amplitude *= 1.15  # Increased amplitude in bradycardia
+    if sns_index > 0.5:  # High sympathetic activity
+        r_amplitude *= 1.1
+    if stress_level == 'High':
+        r_amplitude *= 1.05
+    elif stress_level == 'Low' or stress_level == 'None':
+        r_amplitude *= 0.95
+    if systolic > 160:  # Hypertension effects (LVH pattern)
+        r_amplitude *= 1.3
+    
+    s_amplitude = -0.3 * base_amplitude
+    
+    # ST changes based on ischemia
+    st_level = 0.0
+    st_isoelectric = 0.0
+    if oxygen_saturation < 70 and oxygen_saturation > 0:
+        st_level = 0.15 * base_amplitude  # ST elevation (STEMI pattern)
+    elif oxygen_saturation < 85 and oxygen_saturation > 0:
+        st_level = -0.08 * base_amplitude  # ST depression (ischemia)
+    else:
+        st_isoelectric = 1.0
+    
+    # T wave modifications based on conditions
+    t_amplitude = 0.2 * base_amplitude
+    if oxygen_saturation < 80 and oxygen_saturation > 0:
+        t_amplitude *= -0.8  # T wave inversion in severe hypoxia
+    if stress_level == 'High':
+        t_amplitude *= 1.4  # Peaked T waves (hyperkalemia-like)
+    elif stress_level == 'Low' or stress_level == 'None':
+        t_amplitude *= 0.5  # Flat T waves (hypokalemia-like)
+    if lf_hf > 2:  # Sympathetic dominance
+        t_amplitude *= 1.1
+    elif lf_hf < 0.5:  # Parasympathetic dominance
+        t_amplitude *= 0.9
+    
+    # U Wave (visible in bradycardia and hypokalemia)
+    u_enabled = 1.0 if (heart_rate < 60 or stress_level == 'Low') else 0.0
+    u_amplitude = 0.05 * base_amplitude
+    if stress_level == 'Low':  # Prominent U waves in hypokalemia
+        u_amplitude *= 2
+    
+    return (float(p_amplitude), float(q_amplitude), float(r_amplitude), float(s_amplitude),
+            float(st_level), st_isoelectric, float(t_amplitude), u_enabled, float(u_amplitude))
+
+# --- Loop kernels (JIT-compiled with Numba when available) ---
+
+def _pqrst_loop(norm_times, beat_durations, noise, params):
+    """Per-sample PQRST amplitude; noise[i] is used wherever the trace is isoelectric"""
+    p_amp, q_amp, r_amp, s_amp, st_level, st_iso, t_amp, u_enabled, u_amp = params
+    out = np.zeros(len(norm_times))
+    
+    for i in range(len(norm_times)):
+        beat_duration = beat_durations[i]
+        if beat_duration <= 0:
+            continue
+        norm_time = norm_times[i]
+        
+        p_start = 0.05
+        p_duration = min(0.1 / beat_duration, 0.12)
+        p_end = p_start + p_duration
+        qrs_start = p_start + min(0.16 / beat_duration, 0.2)
+        qrs_duration = min(0.09 / beat_duration, 0.11)
+        qrs_end = qrs_start + qrs_duration
+        st_duration = min(0.1 / beat_duration, 0.12)
+        st_end = qrs_end + st_duration
+        t_duration = min(0.18 / beat_duration, 0.25)
+        t_end = st_end + t_duration
+        
+        if p_start <= norm_time < p_end:
+            out[i] = p_amp * np.sin((norm_time - p_start) / p_duration * np.pi)
+        elif p_end <= norm_time < qrs_start:
+            out[i] = noise[i]
+        elif qrs_start <= norm_time < qrs_end:
+            qrs_phase = (norm_time - qrs_start) / qrs_duration
+            if qrs_phase < 0.15:
+                out[i] = q_amp * np.sin(qrs_phase / 0.15 * np.pi)
+            elif qrs_phase < 0.6:
+                out[i] = r_amp * np.sin((qrs_phase - 0.15) / 0.45 * np.pi)
+            else:
+                out[i] = s_amp * np.sin((qrs_phase - 0.6) / 0.4 * np.pi)
+        elif qrs_end <= norm_time < st_end:
+            if st_iso > 0:
+                out[i] = noise[i]
+            else:
+                out[i] = st_level * (1 - (norm_time - qrs_end) / st_duration)
+        elif st_end <= norm_time < t_end:
+            out[i] = t_amp * np.sin((norm_time - st_end) / t_duration * np.pi)
+        elif t_end <= norm_time < min(t_end + 0.1, 0.95):
+            if u_enabled > 0:
+                out[i] = u_amp * np.sin((norm_time - t_end) / 0.1 * np.pi)
+        else:
+            out[i] = noise[i]
+    
+    return out
+
+def _r_peaks_loop(amplitudes, threshold, min_distance):
+    """Local maxima above threshold, refractory-filtered and window-verified"""
+    n = len(amplitudes)
+    half = min_distance // 2
+    peaks = np.empty(n, dtype=np.int64)
+    count = 0
+    
+    for i in range(1, n - 1):
+        # >= on the right keeps the first sample of flat (quantized) peaks
+        if amplitudes[i] > amplitudes[i-1] and amplitudes[i] >= amplitudes[i+1] and amplitudes[i] > threshold:
+            if count == 0 or (i - peaks[count - 1]) >= min_distance:
+                window_start = max(0, i - half)
+                window_end = min(n, i + half)
+                if amplitudes[i] == np.max(amplitudes[window_start:window_end]):
+                    peaks[count] = i
+                    count += 1
+    
+    return peaks[:count]
+
+def _wave_start_loop(amplitudes, peak_idx, search_start, threshold):
+    """Walk back from the peak to the first sample under threshold, -1 if none"""
+    for i in range(peak_idx, search_start, -1):
+        if i < len(amplitudes) and abs(amplitudes[i]) < threshold:
+            return i
+    return -1
+
+def _wave_end_loop(amplitudes, peak_idx, search_end, baseline, threshold):
+    """Walk forward from the peak to the first sample near baseline, -1 if none"""
+    for i in range(peak_idx, search_end):
+        if i < len(amplitudes) and abs(amplitudes[i] - baseline) < threshold:
+            return i
+    return -1
+
+# --- Pure-NumPy equivalents ---
+
+def _pqrst_numpy(norm_times, beat_durations, noise, params):
+    """Vectorized equivalent of _pqrst_loop"""
+    p_amp, q_amp, r_amp, s_amp, st_level, st_iso, t_amp, u_enabled, u_amp = params
+    valid = beat_durations > 0
+    beat_durations = np.where(valid, beat_durations, 1.0)
+    
+    p_start = 0.05
+    p_duration = np.minimum(0.1 / beat_durations, 0.12)
+    p_end = p_start + p_duration
+    qrs_start = p_start + np.minimum(0.16 / beat_durations, 0.2)
+    qrs_duration = np.minimum(0.09 / beat_durations, 0.11)
+    qrs_end = qrs_start + qrs_duration
+    st_duration = np.minimum(0.1 / beat_durations, 0.12)
+    st_end = qrs_end + st_duration
+    t_duration = np.minimum(0.18 / beat_durations, 0.25)
+    t_end = st_end + t_duration
+    
+    qrs_phase = (norm_times - qrs_start) / qrs_duration
+    qrs_wave = np.where(
+        qrs_phase < 0.15, q_amp * np.sin(qrs_phase / 0.15 * np.pi),
+        np.where(qrs_phase < 0.6, r_amp * np.sin((qrs_phase - 0.15) / 0.45 * np.pi),
+                 s_amp * np.sin((qrs_phase - 0.6) / 0.4 * np.pi))
+    )
+    if st_iso > 0:
+        st_wave = noise
+    else:
+        st_wave = st_level * (1 - (norm_times - qrs_end) / st_duration)
+    u_wave = u_amp * np.sin((norm_times - t_end) / 0.1 * np.pi) if u_enabled > 0 else 0.0
+    
+    # np.select takes the first matching condition, like the if/elif chain
+    out = np.select(
+        [
+            (p_start <= norm_times) & (norm_times < p_end),
+            (p_end <= norm_times) & (norm_times < qrs_start),
+            (qrs_start <= norm_times) & (norm_times < qrs_end),
+            (qrs_end <= norm_times) & (norm_times < st_end),
+            (st_end <= norm_times) & (norm_times < t_end),
+            (t_end <= norm_times) & (norm_times < np.minimum(t_end + 0.1, 0.95)),
+        ],
+        [
+            p_amp * np.sin((norm_times - p_start) / p_duration * np.pi),
+            noise,
+            qrs_wave,
+            st_wave,
+            t_amp * np.sin((norm_times - st_end) / t_duration * np.pi),
+            u_wave,
+        ],
+        default=noise
+    )
+    return np.where(valid, out, 0.0)
+
+def _r_peaks_numpy(amplitudes, threshold, min_distance):
+    """Vectorized candidate search; only the refractory filter walks candidates"""
+    n = len(amplitudes)
+    if n < 3:
+        return np.zeros(0, dtype=np.int64)
+    half = min_distance // 2
+    
+    inner = amplitudes[1:-1]
+    is_candidate = (inner > amplitudes[:-2]) & (inner >= amplitudes[2:]) & (inner > threshold)
+    candidates = np.nonzero(is_candidate)[0] + 1
+    if len(candidates) == 0:
+        return candidates.astype(np.int64)
+    
+    # Max over amplitudes[i - half:i + half] for every candidate
+    padded = np.concatenate((np.full(half, -np.inf), amplitudes, np.full(half, -np.inf)))
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * half)
+    is_window_max = amplitudes[candidates] == windows[candidates].max(axis=1)
+    
+    peaks = []
+    for i, window_max in zip(candidates.tolist(), is_window_max.tolist()):
+        if window_max and (not peaks or i - peaks[-1] >= min_distance):
+            peaks.append(i)
+    return np.asarray(peaks, dtype=np.int64)
+
+def _wave_start_numpy(amplitudes, peak_idx, search_start, threshold):
+    """Vectorized equivalent of _wave_start_loop"""
+    segment = amplitudes[search_start + 1:peak_idx + 1]
+    below = np.nonzero(np.abs(segment) < threshold)[0]
+    return int(search_start + 1 + below[-1]) if len(below) else -1
+
+def _wave_end_numpy(amplitudes, peak_idx, search_end, baseline, threshold):
+    """Vectorized equivalent of _wave_end_loop"""
+    segment = amplitudes[peak_idx:search_end]
+    near = np.nonzero(np.abs(segment - baseline) < threshold)[0]
+    return int(peak_idx + near[0]) if len(near) else -1
+
+KERNEL_BACKENDS = {
+    'numpy': {
+        'pqrst': _pqrst_numpy,
+        'r_peaks': _r_peaks_numpy,
+        'wave_start': _wave_start_numpy,
+        'wave_end': _wave_end_numpy,
+    }
+}
+
+if HAS_NUMBA:
+    # cache=True keeps compiled machine code on disk (__pycache__ or NUMBA_CACHE_DIR)
+    # so restarted workers load it instead of recompiling
+    KERNEL_BACKENDS['numba'] = {
+        'pqrst': numba.njit(cache=True)(_pqrst_loop),
+        'r_peaks': numba.njit(cache=True)(_r_peaks_loop),
+        'wave_start': numba.njit(cache=True)(_wave_start_loop),
+        'wave_end': numba.njit(cache=True)(_wave_end_loop),
+    }
+
+ECG_KERNEL_BACKEND = os.environ.get('ECG_KERNEL_BACKEND', 'numba' if HAS_NUMBA else 'numpy')
+if ECG_KERNEL_BACKEND not in KERNEL_BACKENDS:
+    print(f"Kernel backend '{ECG_KERNEL_BACKEND}' unavailable, using numpy")
+    ECG_KERNEL_BACKEND = 'numpy'
+kernels = KERNEL_BACKENDS[ECG_KERNEL_BACKEND]
+
+def _kernel_parity_inputs(seed):
+    """Synthetic inputs for comparing kernel backends"""
+    rng = np.random.default_rng(seed)
+    sample_rate = 500
+    beat_durations = np.repeat(rng.uniform(0.24, 3.0, 40), sample_rate)
+    norm_times = np.tile(np.arange(sample_rate) / sample_rate, 40)
+    noise = rng.normal(0, 0.002, len(norm_times))
+    params = pqrst_params(1.2, 48, 'Low', 82, 165, 0.7, 0.4)
+    amplitudes = _pqrst_numpy(norm_times, beat_durations, noise, params) + rng.normal(0, 0.01, len(norm_times))
+    return norm_times, beat_durations, noise, params, amplitudes
+
+def verify_kernel_parity(backend='numba', seeds=(0, 1, 2)):
+    """Compare a kernel backend against the NumPy fallback
+    
+    Returns a dict of kernel name -> True/False; empty if the backend is unavailable.
+    """
+    if backend not in KERNEL_BACKENDS:
+        return {}
+    reference = KERNEL_BACKENDS['numpy']
+    candidate = KERNEL_BACKENDS[backend]
+    results = {}
+    
+    for seed in seeds:
+        norm_times, beat_durations, noise, params, amplitudes = _kernel_parity_inputs(seed)
+        
+        same = np.allclose(candidate['pqrst'](norm_times, beat_durations, noise, params),
+                           reference['pqrst'](norm_times, beat_durations, noise, params))
+        results['pqrst'] = results.get('pqrst', True) and bool(same)
+        
+        threshold = np.mean(amplitudes) + 1.5 * np.std(amplitudes)
+        peaks = candidate['r_peaks'](amplitudes, threshold, 100)
+        same = np.array_equal(peaks, reference['r_peaks'](amplitudes, threshold, 100))
+        results['r_peaks'] = results.get('r_peaks', True) and bool(same)
+        
+        same_start = same_end = True
+        for peak in peaks.tolist():
+            search_start = max(0, peak - 150)
+            search_end = min(len(amplitudes), peak + 100)
+            baseline = float(np.mean(amplitudes[peak:peak + 20]))
+            same_start &= (candidate['wave_start'](amplitudes, peak, search_start, 0.05) ==
+                           reference['wave_start'](amplitudes, peak, search_start, 0.05))
+            same_end &= (candidate['wave_end'](amplitudes, peak, search_end, baseline, 0.05) ==
+                         reference['wave_end'](amplitudes, peak, search_end, baseline, 0.05))
+        results['wave_start'] = results.get('wave_start', True) and bool(same_start)
+        results['wave_end'] = results.get('wave_end', True) and bool(same_end)
+    
+    return results
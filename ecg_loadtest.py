@@ -0,0 +1,292 @@
+# ecg_loadtest.py - Offline load test for the ECG Flask endpoints
+#
+# Builds a synthetic reports directory, then drives /api/reports,
+# /api/report_details, /api/generate_ecg and /api/export_ecg with N concurrent
+# clients and reports throughput, latency percentiles and server memory.
+#
+#   python ecg_loadtest.py --clients 8 --seconds 30                 # in-process
+#   python ecg_loadtest.py --mode server --clients 32 --reports 2000
+#   python ecg_loadtest.py --url http://127.0.0.1:5000 --server-pid 1234
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+import numpy as np
+
+from ecg_validation import load_app
+
+DEFAULT_MIX = 'reports=4,report_details=4,generate_ecg=2,export_ecg=1'
+ENDPOINTS = ('reports', 'report_details', 'generate_ecg', 'export_ecg')
+# Every client gets its own governor identity, otherwise all of them share one
+# client's budget and the run measures the admission queue instead of the server
+CLIENT_HEADER = 'X-Client-Id'
+
+def create_reports(reports_dir, count, seed=0):
+    """Write `count` synthetic report JSON files and return their names"""
+    rng = random.Random(seed)
+    reports_dir.mkdir(parents=True, exist_ok=True)
+    names = []
+
+    for i in range(count):
+        heart_rate = rng.randint(45, 160)
+        report = {
+            'id': i + 1,
+            'scan_by': 'loadtest',
+            'created_date': f"2024-01-{1 + i % 28:02d}",
+            'result_time': f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+            'heart_rate': heart_rate,
+            'breathing_rate': rng.randint(10, 24),
+            'hrv_sdnn': round(rng.uniform(20, 120), 1),
+            'mean_rri': round(60000 / heart_rate, 1),
+            'rmssd': round(rng.uniform(15, 90), 1),
+            'stress_level': rng.randint(0, 3),
+            'oxygen_saturation': rng.choice([99, 97, 95, 91, 86, 78]),
+            'blood_pressure': rng.choice(['120/80', '135/85', '150/95', '170/105', '88/58']),
+            'pns_index': round(rng.uniform(-2, 2), 2),
+            'sns_index': round(rng.uniform(-2, 2), 2),
+            'lf_hf': round(rng.uniform(0.2, 4), 2),
+            'wellness_score': rng.randint(30, 100),
+            'heart_age': rng.randint(20, 80),
+        }
+        name = f"report_{i + 1:06d}.json"
+        with open(reports_dir / name, 'w') as f:
+            json.dump(report, f)
+        names.append(name)
+
+    return names
+
+def parse_mix(mix):
+    """Parse 'endpoint=weight,...' into parallel endpoint/weight lists"""
+    endpoints, weights = [], []
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint in mix: {name}")
+        endpoints.append(name)
+        weights.append(float(weight or 1))
+    return endpoints, weights
+
+def build_request(endpoint, rng, report_names, export_payload, ecg_duration):
+    """Return (method, path, json_body) for one request of the mix"""
+    if endpoint == 'reports':
+        return 'GET', '/api/reports', None
+    if endpoint == 'report_details':
+        return 'GET', f"/api/report_details/{rng.choice(report_names)}", None
+    if endpoint == 'generate_ecg':
+        return 'POST', '/api/generate_ecg', {
+            'filename': rng.choice(report_names),
+            'lead': rng.choice(['Lead I', 'Lead II', 'V4']),
+            'duration': ecg_duration
+        }
+    return 'POST', '/api/export_ecg', export_payload
+
+class InProcessClient:
+    """Sends requests through the Flask test client from a distinct remote address"""
+
+    def __init__(self, app, index=0):
+        self.client = app.test_client()
+        self.remote_addr = f"10.0.{index // 256}.{index % 256}"
+
+    def request(self, method, path, body):
+        response = self.client.open(path, method=method, json=body,
+                                    environ_base={'REMOTE_ADDR': self.remote_addr})
+        response.get_data()
+        return response.status_code
+
+class HTTPClient:
+    """Sends requests over a persistent HTTP connection, tagged with a client id"""
+
+    def __init__(self, url, index=0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.client_id = f"loadtest-{index}"
+        self.connection = None
+
+    def request(self, method, path, body):
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=120)
+        try:
+            payload = json.dumps(body) if body is not None else None
+            headers = {'Content-Type': 'application/json'} if body is not None else {}
+            headers[CLIENT_HEADER] = self.client_id
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+            response.read()
+            if response.getheader('Connection', '').lower() == 'close':
+                self.connection.close()
+                self.connection = None
+            return response.status
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = None
+            raise
+
+def run_clients(make_client, clients, seconds, total_requests, mix, report_names, export_payload, ecg_duration):
+    """Run concurrent clients and collect (endpoint, latency_s, status) samples"""
+    endpoints, weights = parse_mix(mix)
+    samples = []
+    samples_lock = threading.Lock()
+    issued = [0]
+    deadline = time.perf_counter() + seconds
+
+    def worker(index):
+        rng = random.Random(index)
+        client = make_client(index)
+        local = []
+        while time.perf_counter() < deadline:
+            if total_requests:
+                with samples_lock:
+                    if issued[0] >= total_requests:
+                        break
+                    issued[0] += 1
+            endpoint = rng.choices(endpoints, weights)[0]
+            method, path, body = build_request(endpoint, rng, report_names, export_payload, ecg_duration)
+            start = time.perf_counter()
+            try:
+                status = client.request(method, path, body)
+            except Exception:
+                status = 0
+            local.append((endpoint, time.perf_counter() - start, status))
+        with samples_lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+def read_rss_mb(pid):
+    """Current and peak RSS of a process in MB from /proc (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+        return int(fields['VmRSS'].split()[0]) / 1024, int(fields['VmHWM'].split()[0]) / 1024
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+def print_results(samples, elapsed, rss):
+    """Print throughput and latency percentiles per endpoint"""
+    print(f"\n{'endpoint':>15} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint in ENDPOINTS + ('all',):
+        rows = [s for s in samples if endpoint == 'all' or s[0] == endpoint]
+        if not rows:
+            continue
+        latencies = np.array([latency for _, latency, _ in rows]) * 1000
+        errors = sum(1 for _, _, status in rows if not 200 <= status < 300)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f"{endpoint:>15} {len(rows):>9} {errors:>7} {len(rows) / elapsed:>8.1f} "
+              f"{p50:>8.1f} {p95:>8.1f} {p99:>8.1f}")
+
+    current, peak = rss
+    if current is not None:
+        print(f"\nServer RSS: {current:.1f} MB (peak {peak:.1f} MB)")
+
+def serve(workspace, port):
+    """Run the app on localhost with its data directories inside `workspace`"""
+    os.chdir(workspace)
+    app = load_app()
+    app.start_background_services()
+    app.app.run(host='127.0.0.1', port=port, threaded=True, debug=False, use_reloader=False)
+
+def wait_for_server(url, timeout=30):
+    """Poll the server until /api/reports answers"""
+    client = HTTPClient(url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if client.request('GET', '/api/reports', None) == 200:
+                return True
+        except (OSError, http.client.HTTPException):
+            pass
+        time.sleep(0.2)
+    return False
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the ECG Flask endpoints')
+    parser.add_argument('--mode', choices=['inprocess', 'server'], default='inprocess')
+    parser.add_argument('--url', help='drive an already running local server instead')
+    parser.add_argument('--server-pid', type=int, help='pid of the --url server, for RSS')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--reports', type=int, default=200, help='synthetic reports to create')
+    parser.add_argument('--workspace', help='directory for reports/exports (default: temporary)')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--requests', type=int, default=0, help='stop after this many requests')
+    parser.add_argument('--mix', default=DEFAULT_MIX)
+    parser.add_argument('--ecg-duration', type=int, default=10)
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args.workspace, args.port)
+        return
+
+    parse_mix(args.mix)
+    workspace = Path(args.workspace or tempfile.mkdtemp(prefix='ecg_loadtest_')).resolve()
+    report_names = create_reports(workspace / 'reports', args.reports)
+    (workspace / 'exports').mkdir(exist_ok=True)
+    print(f"Workspace: {workspace} ({len(report_names)} reports)")
+
+    # A single generated trace is reused as the export payload
+    os.chdir(workspace)
+    app = load_app()
+    with open(workspace / 'reports' / report_names[0]) as f:
+        trace = app.ecg_generator.generate_ecg_from_report(json.load(f), 'Lead II', args.ecg_duration)
+    export_payload = {'ecg_data': trace, 'filename': 'loadtest', 'lead': 'Lead_II'}
+
+    server = None
+    server_pid = args.server_pid
+    try:
+        if args.url:
+            url = args.url
+            make_client = lambda index: HTTPClient(url, index)
+            print(f"Start the server with ECG_CLIENT_HEADER={CLIENT_HEADER} so clients get separate budgets")
+        elif args.mode == 'server':
+            url = f"http://127.0.0.1:{args.port}"
+            server = subprocess.Popen(
+                [sys.executable, str(Path(__file__).resolve()), '--serve',
+                 '--workspace', str(workspace), '--port', str(args.port)],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                env={**os.environ, 'ECG_CLIENT_HEADER': CLIENT_HEADER}
+            )
+            server_pid = server.pid
+            if not wait_for_server(url):
+                print("Server did not start")
+                return 1
+            make_client = lambda index: HTTPClient(url, index)
+        else:
+            make_client = lambda index: InProcessClient(app.app, index)
+
+        print(f"Running {args.clients} clients for {args.seconds}s, mix {args.mix}...")
+        samples, elapsed = run_clients(
+            make_client, args.clients, args.seconds, args.requests, args.mix,
+            report_names, export_payload, args.ecg_duration
+        )
+
+        # In-process mode measures this process, which is the server
+        print_results(samples, elapsed, read_rss_mb(server_pid or os.getpid()))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if not args.workspace:
+            os.chdir(tempfile.gettempdir())
+            shutil.rmtree(workspace, ignore_errors=True)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,215 @@
+# ecg_validation.py - Accuracy and throughput sweep for the ECG generator
+#
+# Generates traces for a grid of report profiles and leads, runs
+# calculate_ecg_metrics on them and compares the recovered heart rate, RMSSD
+# and SDNN with the values that were fed in.
+#
+#   python ecg_validation.py                 # quick grid
+#   python ecg_validation.py --grid full --csv validation.csv
+import argparse
+import csv
+import importlib.util
+import itertools
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+APP_PATH = Path(__file__).resolve().parent / 'app3 1.py'
+
+# Parameter grids swept by the harness
+GRIDS = {
+    'quick': {
+        'heart_rate': [20, 45, 72, 120, 180, 250],
+        'oxygen_saturation': [98, 82],
+        'blood_pressure': ['120/80', '170/100'],
+        'stress_level': [1, 3],
+        'autonomic': [(0.0, 0.0, 1.0)],
+        'lead': ['Lead II', 'aVR'],
+    },
+    'full': {
+        'heart_rate': [20, 30, 45, 60, 72, 90, 120, 150, 180, 210, 250],
+        'oxygen_saturation': [98, 92, 82, 65],
+        'blood_pressure': ['120/80', '150/95', '170/100', '85/55'],
+        'stress_level': [0, 1, 2, 3],
+        # (sns_index, pns_index, lf_hf)
+        'autonomic': [(0.0, 0.0, 1.0), (1.0, -1.0, 3.0), (-1.0, 1.0, 0.3)],
+        'lead': ['Lead I', 'Lead II', 'aVR', 'V1', 'V4'],
+    },
+}
+
+RESULT_COLUMNS = [
+    'lead', 'heart_rate', 'spo2', 'bp', 'stress', 'sns', 'pns', 'lf_hf',
+    'hr_error', 'rmssd_error', 'sdnn_error', 'hr_error_detect',
+    'rmssd_error_detect', 'sdnn_error_detect', 'samples_per_s',
+    'samples_per_s_detect', 'peak_rss_mb'
+]
+
+_app = None
+
+def load_app():
+    """Import the Flask app module (its file name is not a valid module name)"""
+    global _app
+    if _app is None:
+        spec = importlib.util.spec_from_file_location('ecg_app', APP_PATH)
+        _app = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(_app)
+    return _app
+
+def build_profiles(grid, hrv_sdnn, rmssd):
+    """Expand a grid into (lead, report) pairs"""
+    profiles = []
+    for heart_rate, spo2, bp, stress, (sns, pns, lf_hf), lead in itertools.product(
+            grid['heart_rate'], grid['oxygen_saturation'], grid['blood_pressure'],
+            grid['stress_level'], grid['autonomic'], grid['lead']):
+        profiles.append((lead, {
+            'heart_rate': heart_rate,
+            'mean_rri': 60000.0 / heart_rate,
+            'hrv_sdnn': hrv_sdnn,
+            'rmssd': rmssd,
+            'oxygen_saturation': spo2,
+            'blood_pressure': bp,
+            'stress_level': stress,
+            'sns_index': sns,
+            'pns_index': pns,
+            'lf_hf': lf_hf,
+            'breathing_rate': 16,
+        }))
+    return profiles
+
+def _relative_error(measured, expected):
+    """Signed error in percent of the expected value"""
+    if not expected:
+        return float('nan')
+    return 100.0 * (measured - expected) / expected
+
+def run_profile(task):
+    """Generate and analyse one profile; runs in a worker process"""
+    lead, report, duration, repeats, seed = task
+    app = load_app()
+    generator = app.ecg_generator
+    np.random.seed(seed)
+
+    errors = {key: [] for key in ('hr', 'rmssd', 'sdnn', 'hr_detect', 'rmssd_detect', 'sdnn_detect')}
+    fast_seconds = 0.0
+    detect_seconds = 0.0
+    total_samples = 0
+
+    # Untimed warm-up: each task runs in a fresh process, so the first call would
+    # otherwise pay for the module import and loading the compiled kernels
+    warm_data, warm_annotations = generator.generate_ecg_from_report(report, lead, duration, with_annotations=True)
+    generator.calculate_ecg_metrics(warm_data, warm_annotations)
+    generator.calculate_ecg_metrics(warm_data)
+    np.random.seed(seed)
+
+    for _ in range(repeats):
+        start = time.perf_counter()
+        ecg_data, annotations = generator.generate_ecg_from_report(
+            report, lead, duration, with_annotations=True
+        )
+        generated = time.perf_counter()
+        fast = generator.calculate_ecg_metrics(ecg_data, annotations)
+        fast_done = time.perf_counter()
+        detected = generator.calculate_ecg_metrics(ecg_data)
+        detect_done = time.perf_counter()
+
+        fast_seconds += fast_done - start
+        detect_seconds += (generated - start) + (detect_done - fast_done)
+        total_samples += len(ecg_data)
+
+        for suffix, metrics in (('', fast), ('_detect', detected)):
+            errors['hr' + suffix].append(_relative_error(metrics.get('calculated_heart_rate', 0), report['heart_rate']))
+            errors['rmssd' + suffix].append(_relative_error(metrics.get('calculated_rmssd', 0), report['rmssd']))
+            errors['sdnn' + suffix].append(_relative_error(metrics.get('calculated_sdnn', 0), report['hrv_sdnn']))
+
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (1024 * 1024) if sys.platform == 'darwin' else peak_rss / 1024
+
+    return {
+        'lead': lead,
+        'heart_rate': report['heart_rate'],
+        'spo2': report['oxygen_saturation'],
+        'bp': report['blood_pressure'],
+        'stress': report['stress_level'],
+        'sns': report['sns_index'],
+        'pns': report['pns_index'],
+        'lf_hf': report['lf_hf'],
+        'hr_error': round(float(np.mean(errors['hr'])), 2),
+        'rmssd_error': round(float(np.mean(errors['rmssd'])), 2),
+        'sdnn_error': round(float(np.mean(errors['sdnn'])), 2),
+        'hr_error_detect': round(float(np.mean(errors['hr_detect'])), 2),
+        'rmssd_error_detect': round(float(np.mean(errors['rmssd_detect'])), 2),
+        'sdnn_error_detect': round(float(np.mean(errors['sdnn_detect'])), 2),
+        'samples_per_s': round(total_samples / fast_seconds) if fast_seconds > 0 else 0,
+        'samples_per_s_detect': round(total_samples / detect_seconds) if detect_seconds > 0 else 0,
+        'peak_rss_mb': round(peak_rss_mb, 1),
+    }
+
+def print_table(rows):
+    """Print results as an aligned text table"""
+    widths = {column: max(len(column), *(len(str(row[column])) for row in rows)) for column in RESULT_COLUMNS}
+    print('  '.join(column.rjust(widths[column]) for column in RESULT_COLUMNS))
+    for row in rows:
+        print('  '.join(str(row[column]).rjust(widths[column]) for column in RESULT_COLUMNS))
+
+def print_summary(rows, error_limit):
+    """Print the profiles with the largest errors and the lowest throughput"""
+    def worst_error(row):
+        return np.nanmax(np.abs([row['hr_error'], row['rmssd_error'], row['sdnn_error']]))
+
+    failing = [row for row in rows if abs(row['hr_error']) > error_limit or abs(row['hr_error_detect']) > error_limit]
+    slowest = sorted(rows, key=lambda row: row['samples_per_s'])[:5]
+    worst = sorted(rows, key=worst_error, reverse=True)[:5]
+
+    print(f"\nProfiles: {len(rows)}  HR error > {error_limit}%: {len(failing)}")
+    print("Largest HRV/HR errors:")
+    for row in worst:
+        print(f"  {row['lead']:>7} HR {row['heart_rate']:>3}  hr {row['hr_error']:+.1f}%  "
+              f"rmssd {row['rmssd_error']:+.1f}%  sdnn {row['sdnn_error']:+.1f}%")
+    print("Lowest throughput:")
+    for row in slowest:
+        print(f"  {row['lead']:>7} HR {row['heart_rate']:>3}  {row['samples_per_s']} samples/s "
+              f"({row['samples_per_s_detect']} with detection)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ECG generator accuracy/throughput sweep')
+    parser.add_argument('--grid', choices=sorted(GRIDS), default='quick')
+    parser.add_argument('--duration', type=int, default=30, help='trace length in seconds')
+    parser.add_argument('--repeats', type=int, default=3, help='traces per profile')
+    parser.add_argument('--hrv-sdnn', type=float, default=40.0)
+    parser.add_argument('--rmssd', type=float, default=30.0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--error-limit', type=float, default=5.0, help='HR error (%%) flagged in the summary')
+    parser.add_argument('--csv', help='also write the table to this CSV file')
+    args = parser.parse_args(argv)
+
+    app = load_app()
+    print(f"Kernel backend: {app.ECG_KERNEL_BACKEND}")
+    if app.ECG_KERNEL_BACKEND != 'numpy':
+        print(f"Kernel parity with numpy: {app.verify_kernel_parity(app.ECG_KERNEL_BACKEND)}")
+
+    profiles = build_profiles(GRIDS[args.grid], args.hrv_sdnn, args.rmssd)
+    tasks = [(lead, report, args.duration, args.repeats, seed) for seed, (lead, report) in enumerate(profiles)]
+    print(f"Running {len(tasks)} profiles on {args.workers} workers...")
+
+    # One task per worker process so peak RSS is measured per profile
+    with multiprocessing.Pool(args.workers, maxtasksperchild=1) as pool:
+        rows = pool.map(run_profile, tasks, chunksize=1)
+
+    print_table(rows)
+    print_summary(rows, args.error_limit)
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Wrote {args.csv}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+import importlib.util
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# The ECG modules live at the repository root, next to the Next.js app
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+@pytest.fixture(scope='session')
+def ecg_app(tmp_path_factory):
+    """The Flask app module, imported inside a scratch directory
+    
+    The app creates its reports/exports/uploads directories relative to the
+    working directory on import, so tests run from a temporary one.
+    """
+    workdir = tmp_path_factory.mktemp('ecg_app')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        spec = importlib.util.spec_from_file_location('ecg_app', ROOT / 'app3 1.py')
+        module = importlib.util.module_from_spec(spec)
+        sys.modules['ecg_app'] = module
+        spec.loader.exec_module(module)
+        yield module
+    finally:
+        os.chdir(cwd)
@@ -0,0 +1,74 @@
+# Generator annotation table against the rendered trace
+import numpy as np
+import pytest
+
+REPORT = {'heart_rate': 72, 'mean_rri': 833, 'hrv_sdnn': 40, 'rmssd': 30}
+
+@pytest.fixture
+def generator(ecg_app):
+    np.random.seed(1234)
+    return ecg_app.ECGGenerator()
+
+def render_clean(generator, report, duration):
+    """Noise-free trace rendered with the generator's own beat schedule"""
+    trace = generator._prepare_trace(report, 'Lead II')
+    trace.update(noise_level=0.0, breathing_rate=0)
+    total_samples = duration * generator.sample_rate
+    sample_times = np.arange(total_samples) / generator.sample_rate
+    beat_times = []
+    current_time = 0
+    while current_time < duration:
+        beat_times.append(current_time)
+        current_time += generator._next_rr_interval(trace)
+    amplitudes, _ = generator._render(trace, sample_times, np.asarray(beat_times))
+    annotations = generator._build_annotations(beat_times, trace['base_rr_interval'], total_samples)
+    return amplitudes, annotations
+
+@pytest.mark.parametrize('report', [
+    REPORT,
+    {'heart_rate': 160, 'mean_rri': 375, 'hrv_sdnn': 20, 'rmssd': 10},
+    {'heart_rate': 45, 'mean_rri': 1333, 'hrv_sdnn': 60, 'rmssd': 40},
+])
+def test_r_and_t_peaks_are_the_trace_extrema(generator, report):
+    amplitudes, annotations = render_clean(generator, report, 30)
+    complete = annotations['t_offset'] < len(amplitudes)
+    assert np.count_nonzero(complete) > 10
+    
+    beats = {key: values[complete] for key, values in annotations.items()}
+    for qrs_onset, r_peak, qrs_offset, t_onset, t_peak, t_offset in zip(
+            beats['qrs_onset'], beats['r_peak'], beats['qrs_offset'],
+            beats['t_onset'], beats['t_peak'], beats['t_offset']):
+        assert r_peak == qrs_onset + np.argmax(amplitudes[qrs_onset:qrs_offset])
+        t_wave = amplitudes[t_onset:t_offset]
+        assert t_peak == t_onset + np.argmax(np.abs(t_wave))
+
+def test_fast_path_and_detection_agree_on_heart_rate(generator):
+    data, annotations = generator.generate_ecg_from_report(REPORT, 'Lead II', 60, with_annotations=True)
+    fast = generator.calculate_ecg_metrics(data, annotations)
+    detected = generator.calculate_ecg_metrics(data)
+    
+    assert fast['r_peaks_detected'] == detected['r_peaks_detected']
+    assert fast['calculated_heart_rate'] == pytest.approx(detected['calculated_heart_rate'], abs=0.5)
+    assert fast['calculated_sdnn'] == pytest.approx(detected['calculated_sdnn'], abs=2)
+
+def test_flatline_has_no_beats(generator):
+    data, annotations = generator.generate_ecg_from_report({'heart_rate': 0}, 'Lead II', 10,
+                                                           with_annotations=True)
+    assert len(data) == 10 * generator.sample_rate
+    assert all(len(values) == 0 for values in annotations.values())
+    
+    fast = generator.calculate_ecg_metrics(data, annotations)
+    assert fast == generator.calculate_ecg_metrics(data)
+    assert fast['r_peaks_detected'] == 0
+
+def test_single_beat(generator):
+    report = {'heart_rate': 40, 'mean_rri': 1500, 'hrv_sdnn': 0, 'rmssd': 0}
+    data, annotations = generator.generate_ecg_from_report(report, 'Lead II', 1, with_annotations=True)
+    assert len(annotations['r_peak']) == 1
+    
+    metrics = generator.calculate_ecg_metrics(data, annotations)
+    assert metrics['r_peaks_detected'] == 1
+    assert metrics['rr_intervals_count'] == 0
+    assert metrics['calculated_heart_rate'] == 0
+    assert metrics['intervals_measured'] == 1
+    assert metrics['qrs_duration'] > 0
@@ -0,0 +1,71 @@
+# Batched HRV analysis against RR series with a known spectrum
+import numpy as np
+import pytest
+
+import ecg_hrv
+from ecg_hrv import HRV_KEYS, batch_hrv_metrics, hrv_metrics
+
+LF_AMPLITUDE = 30  # ms at 0.1 Hz
+HF_AMPLITUDE = 15  # ms at 0.25 Hz
+
+def modulated_rr(duration, mean_rr=800):
+    """RR series (ms) whose tachogram is a 0.1 Hz plus a 0.25 Hz sinusoid"""
+    rr_intervals = []
+    elapsed = 0
+    while elapsed < duration:
+        rr = (mean_rr + LF_AMPLITUDE * np.sin(2 * np.pi * 0.1 * elapsed)
+              + HF_AMPLITUDE * np.sin(2 * np.pi * 0.25 * elapsed))
+        rr_intervals.append(rr)
+        elapsed += rr / 1000
+    return np.array(rr_intervals)
+
+@pytest.mark.parametrize('method', ['lomb', 'welch'])
+@pytest.mark.parametrize('mean_rr', [500, 800, 1200])
+def test_band_powers_of_known_sinusoids(method, mean_rr):
+    metrics = hrv_metrics(modulated_rr(300, mean_rr), method)
+    
+    # A sinusoid of amplitude A has power A^2 / 2
+    assert metrics['lf_power'] == pytest.approx(LF_AMPLITUDE ** 2 / 2, rel=0.05)
+    assert metrics['hf_power'] == pytest.approx(HF_AMPLITUDE ** 2 / 2, rel=0.05)
+    assert metrics['lf_hf'] == pytest.approx((LF_AMPLITUDE / HF_AMPLITUDE) ** 2, rel=0.05)
+    assert metrics['lf_nu'] == pytest.approx(80, abs=1)
+
+@pytest.mark.parametrize('method', ['lomb', 'welch'])
+def test_spectral_values_need_sixty_seconds(method):
+    short, long = modulated_rr(59), modulated_rr(120)
+    batch = batch_hrv_metrics([short, long], method)
+    
+    for key in ('vlf_power', 'lf_power', 'hf_power', 'total_power', 'lf_nu', 'hf_nu', 'lf_hf'):
+        assert np.isnan(batch[key][0])
+        assert not np.isnan(batch[key][1])
+    # Time-domain and Poincare values do not need the minimum duration
+    for key in ('pnn50', 'sd1', 'sd2', 'sd1_sd2_ratio'):
+        assert not np.isnan(batch[key][0])
+    assert hrv_metrics(short, method)['lf_hf'] is None
+
+@pytest.mark.parametrize('method', ['lomb', 'welch'])
+def test_empty_batch(method):
+    batch = batch_hrv_metrics([], method)
+    assert set(batch) == set(HRV_KEYS)
+    assert all(len(values) == 0 for values in batch.values())
+
+@pytest.mark.parametrize('method', ['lomb', 'welch'])
+def test_batch_matches_single_series(method):
+    rng = np.random.default_rng(3)
+    series = [rr + rng.normal(0, 10, len(rr))
+              for rr in (modulated_rr(duration) for duration in (90, 300, 30, 180))]
+    batch = batch_hrv_metrics(series, method)
+    
+    for i, rr in enumerate(series):
+        single = batch_hrv_metrics([rr], method)
+        for key in HRV_KEYS:
+            np.testing.assert_allclose(batch[key][i], single[key][0], rtol=1e-9)
+
+def test_lomb_frequency_blocks_do_not_change_the_spectrum(monkeypatch):
+    series = [modulated_rr(300), modulated_rr(120)]
+    expected = ecg_hrv.lomb_scargle_batch(ecg_hrv.pad_rr_series(series)[0])
+    
+    # Small enough that a single row is split along the frequency axis
+    monkeypatch.setattr(ecg_hrv, 'LOMB_BLOCK_ELEMENTS', 10_000)
+    blocked = ecg_hrv.lomb_scargle_batch(ecg_hrv.pad_rr_series(series)[0])
+    np.testing.assert_allclose(blocked, expected, rtol=1e-12)
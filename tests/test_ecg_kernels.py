@@ -0,0 +1,95 @@
+# Parity of the Numba loop kernels with their NumPy equivalents
+import numpy as np
+import pytest
+
+pytest.importorskip('numba')
+
+from ecg_kernels import KERNEL_BACKENDS, pqrst_params
+
+SAMPLE_RATE = 500
+
+# (base_amplitude, heart_rate, stress_level, oxygen_saturation, systolic, sns_index, lf_hf)
+PARAMETER_SETS = {
+    'normal': (1.0, 72, 'Medium', 98, 120, 0.0, 1.0),
+    'stemi': (1.0, 110, 'High', 65, 130, 0.8, 2.5),
+    'tachycardic_stressed': (0.9, 160, 'High', 92, 150, 0.6, 3.0),
+    'bradycardic_ischemic': (1.2, 48, 'Low', 82, 165, 0.7, 0.4),
+}
+
+@pytest.fixture(scope='module')
+def numba_kernels():
+    return KERNEL_BACKENDS['numba']
+
+@pytest.fixture(scope='module')
+def numpy_kernels():
+    return KERNEL_BACKENDS['numpy']
+
+def make_inputs(seed, invalid_beats=False):
+    """Per-sample beat phase, beat durations and noise for 40 beats"""
+    rng = np.random.default_rng(seed)
+    beat_durations = np.repeat(rng.uniform(0.24, 3.0, 40), SAMPLE_RATE)
+    if invalid_beats:
+        beat_durations[::7] = 0.0
+        beat_durations[3::11] = -0.5
+    norm_times = np.tile(np.arange(SAMPLE_RATE) / SAMPLE_RATE, 40)
+    noise = rng.normal(0, 0.002, len(norm_times))
+    return norm_times, beat_durations, noise
+
+def make_trace(params, seed):
+    norm_times, beat_durations, noise = make_inputs(seed)
+    rng = np.random.default_rng(seed + 100)
+    amplitudes = KERNEL_BACKENDS['numpy']['pqrst'](norm_times, beat_durations, noise, params)
+    return amplitudes + rng.normal(0, 0.01, len(amplitudes))
+
+def test_parameter_sets_cover_every_branch():
+    resolved = [pqrst_params(*values) for values in PARAMETER_SETS.values()]
+    st_isoelectric = {params[5] for params in resolved}
+    u_enabled = {params[7] for params in resolved}
+    st_level_signs = {np.sign(params[4]) for params in resolved}
+    assert st_isoelectric == {0.0, 1.0}
+    assert u_enabled == {0.0, 1.0}
+    assert st_level_signs == {-1.0, 0.0, 1.0}
+
+@pytest.mark.parametrize('name', sorted(PARAMETER_SETS))
+@pytest.mark.parametrize('invalid_beats', [False, True])
+def test_pqrst_parity(numba_kernels, numpy_kernels, name, invalid_beats):
+    params = pqrst_params(*PARAMETER_SETS[name])
+    norm_times, beat_durations, noise = make_inputs(seed=0, invalid_beats=invalid_beats)
+    
+    expected = numpy_kernels['pqrst'](norm_times, beat_durations, noise, params)
+    actual = numba_kernels['pqrst'](norm_times, beat_durations, noise, params)
+    
+    np.testing.assert_allclose(actual, expected, rtol=1e-12, atol=1e-12)
+    if invalid_beats:
+        assert not actual[beat_durations <= 0].any()
+
+@pytest.mark.parametrize('name', sorted(PARAMETER_SETS))
+@pytest.mark.parametrize('quantized', [False, True])
+def test_r_peaks_parity(numba_kernels, numpy_kernels, name, quantized):
+    amplitudes = make_trace(pqrst_params(*PARAMETER_SETS[name]), seed=1)
+    if quantized:
+        # Integer ADC counts produce flat-topped peaks
+        amplitudes = np.round(amplitudes * 200) / 200
+    threshold = np.mean(amplitudes) + 1.5 * np.std(amplitudes)
+    
+    expected = numpy_kernels['r_peaks'](amplitudes, threshold, 100)
+    actual = numba_kernels['r_peaks'](amplitudes, threshold, 100)
+    
+    assert len(expected) > 0
+    np.testing.assert_array_equal(actual, expected)
+
+@pytest.mark.parametrize('name', sorted(PARAMETER_SETS))
+def test_wave_boundary_parity(numba_kernels, numpy_kernels, name):
+    amplitudes = make_trace(pqrst_params(*PARAMETER_SETS[name]), seed=2)
+    threshold = np.mean(amplitudes) + 1.5 * np.std(amplitudes)
+    peaks = numpy_kernels['r_peaks'](amplitudes, threshold, 100)
+    
+    for peak in peaks.tolist():
+        search_start = max(0, peak - 150)
+        search_end = min(len(amplitudes), peak + 100)
+        baseline = float(np.mean(amplitudes[peak:peak + 20]))
+        for wave_threshold in (0.01, 0.05, 0.2):
+            assert (numba_kernels['wave_start'](amplitudes, peak, search_start, wave_threshold) ==
+                    numpy_kernels['wave_start'](amplitudes, peak, search_start, wave_threshold))
+            assert (numba_kernels['wave_end'](amplitudes, peak, search_end, baseline, wave_threshold) ==
+                    numpy_kernels['wave_end'](amplitudes, peak, search_end, baseline, wave_threshold))
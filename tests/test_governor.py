@@ -0,0 +1,131 @@
+# Admission control: size limits, bounded queue and per-client budgets
+import threading
+import time
+
+import pytest
+
+def cost(memory_bytes, samples=0, cpu_seconds=1.0):
+    return {'samples': samples, 'memory_bytes': memory_bytes, 'cpu_seconds': cpu_seconds}
+
+@pytest.fixture
+def governor(ecg_app):
+    return ecg_app.ResourceGovernor(
+        max_concurrent=2, memory_budget=1000, client_max_concurrent=1, client_memory_budget=600,
+        max_queued=1, queue_timeout=0.2, max_samples=100
+    )
+
+class Holder:
+    """Keep a request admitted in a background thread until released"""
+    
+    def __init__(self, governor, client, request_cost):
+        self.admitted = threading.Event()
+        self.release = threading.Event()
+        self.error = None
+        
+        def run():
+            try:
+                with governor.admit(client, request_cost):
+                    self.admitted.set()
+                    self.release.wait(5)
+            except Exception as e:
+                self.error = e
+        
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+    
+    def finish(self):
+        self.release.set()
+        self.thread.join(5)
+
+def wait_for_queue(governor, queued):
+    deadline = time.time() + 5
+    while governor.status()['queued'] != queued:
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+def test_oversized_requests_are_413(ecg_app, governor):
+    with pytest.raises(ecg_app.AdmissionRejected) as too_many_samples:
+        with governor.admit('a', cost(10, samples=101)):
+            pass
+    with pytest.raises(ecg_app.AdmissionRejected) as too_much_memory:
+        with governor.admit('a', cost(601)):  # over the client budget, under the global one
+            pass
+    
+    assert too_many_samples.value.status == 413
+    assert too_much_memory.value.status == 413
+    assert too_many_samples.value.retry_after is None
+    assert governor.status()['rejected'] == 2
+
+def test_queue_timeout_is_429_with_retry_after(ecg_app, governor):
+    holder = Holder(governor, 'a', cost(100, cpu_seconds=7))
+    assert holder.admitted.wait(5)
+    
+    start = time.time()
+    with pytest.raises(ecg_app.AdmissionRejected) as rejected:
+        with governor.admit('a', cost(100)):
+            pass
+    holder.finish()
+    
+    assert time.time() - start >= 0.2
+    assert rejected.value.status == 429
+    assert rejected.value.retry_after == 4  # 7 cpu-seconds in flight over 2 slots
+    assert governor.status()['queued'] == 0
+
+def test_full_queue_is_rejected_immediately(ecg_app, governor):
+    governor.queue_timeout = 5
+    holder = Holder(governor, 'a', cost(100))
+    assert holder.admitted.wait(5)
+    waiter = Holder(governor, 'a', cost(100))
+    wait_for_queue(governor, 1)
+    
+    start = time.time()
+    with pytest.raises(ecg_app.AdmissionRejected) as rejected:
+        with governor.admit('a', cost(100)):
+            pass
+    assert time.time() - start < 1
+    assert rejected.value.status == 429
+    
+    # The queued request is admitted once the first one finishes
+    holder.finish()
+    assert waiter.admitted.wait(5)
+    waiter.finish()
+    assert waiter.error is None
+
+def test_budgets_are_accounted_per_client(ecg_app, governor):
+    first = Holder(governor, 'a', cost(500, cpu_seconds=2))
+    assert first.admitted.wait(5)
+    
+    # Client 'a' is at its concurrency limit, another client is not
+    other = Holder(governor, 'b', cost(500, cpu_seconds=3))
+    assert other.admitted.wait(5)
+    status = governor.status()
+    assert status['active'] == 2
+    assert status['memory_reserved'] == 1000
+    assert status['cpu_seconds_in_flight'] == 5
+    assert status['clients'] == 2
+    
+    # Global memory is now exhausted for everyone
+    with pytest.raises(ecg_app.AdmissionRejected):
+        with governor.admit('c', cost(1)):
+            pass
+    
+    first.finish()
+    other.finish()
+    status = governor.status()
+    assert (status['active'], status['memory_reserved'], status['cpu_seconds_in_flight'],
+            status['clients']) == (0, 0, 0, 0)
+    assert (status['admitted'], status['rejected']) == (2, 1)
+    
+    # Budget released by an exception inside the block as well
+    with pytest.raises(RuntimeError):
+        with governor.admit('a', cost(600)):
+            raise RuntimeError('generation failed')
+    assert governor.status()['memory_reserved'] == 0
+
+@pytest.mark.parametrize('duration', ['ten', None, [10], '1.5'])
+def test_generate_rejects_non_numeric_duration(ecg_app, duration):
+    response = ecg_app.app.test_client().post(
+        '/api/generate_ecg', json={'filename': 'report.json', 'duration': duration}
+    )
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
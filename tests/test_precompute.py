@@ -0,0 +1,37 @@
+# Precomputed response store: one-shot serving and per-report file ownership
+import pytest
+
+@pytest.fixture
+def store(ecg_app, tmp_path):
+    reports = tmp_path / 'reports'
+    reports.mkdir()
+    return ecg_app.PrecomputeStore(tmp_path / 'precomputed', reports)
+
+def stored_names(store):
+    return sorted(path.name for path in store.directory.iterdir())
+
+def test_response_is_served_once(store):
+    (store.reports_dir / 'a.json').write_text('{}')
+    signature = store.signature('a.json')
+    store.save('a.json', 'Lead II', 10, signature, '{"success": true}')
+    
+    assert store.take('a.json', 'Lead II', 10) == b'{"success": true}'
+    assert store.take('a.json', 'Lead II', 10) is None
+    assert store.done('a.json', 'Lead II', 10, signature)
+    assert store.count() == 0
+
+def test_reports_sharing_a_stem_prefix_keep_their_results(store):
+    names = ('a.json', 'a.b.json', 'a.Lead_II.10s.x.json')
+    for name in names:
+        store.save(name, 'Lead II', 10, '1-2', '{}')
+    
+    # A new version replaces only the same report's old one
+    store.save('a.json', 'Lead II', 10, '3-4', '{}')
+    assert stored_names(store) == sorted([
+        'a.Lead_II.10s.3-4.json', 'a.b.Lead_II.10s.1-2.json', 'a.Lead_II.10s.x.Lead_II.10s.1-2.json'
+    ])
+    
+    store.discard('a.json', ('Lead II',), 10)
+    assert stored_names(store) == sorted([
+        'a.b.Lead_II.10s.1-2.json', 'a.Lead_II.10s.x.Lead_II.10s.1-2.json'
+    ])
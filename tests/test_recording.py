@@ -0,0 +1,82 @@
+# Memory-mapped recording reader and chunked analysis
+import numpy as np
+import pytest
+
+SAMPLE_RATE = 500
+GAIN = 200.0
+REPORT = {'heart_rate': 66, 'mean_rri': 909, 'hrv_sdnn': 40, 'rmssd': 30}
+
+@pytest.fixture(scope='module')
+def trace(ecg_app):
+    """90 s of Lead II as WFDB-style int16 counts, with its annotation table"""
+    np.random.seed(7)
+    generator = ecg_app.ECGGenerator(sample_rate=SAMPLE_RATE)
+    data, annotations = generator.generate_ecg_from_report(REPORT, 'Lead II', 90, with_annotations=True)
+    amplitudes = np.array([point['amplitude'] for point in data])
+    return np.round(amplitudes * GAIN).astype('<i2'), annotations
+
+def test_header_byte_offset_and_baseline(ecg_app, tmp_path):
+    header = tmp_path / 'rec.hea'
+    header.write_text(
+        '# comment line\n'
+        'rec 2 360 1000\n'
+        'rec.dat 16+24 200(10)/mV 16 0 0 0 0 MLII\n'
+        'rec.dat 16+24 100/mV 16 5 0 0 0 V5\n'
+    )
+    parsed = ecg_app.read_wfdb_header(header)
+    
+    assert parsed['sample_rate'] == 360
+    first, second = parsed['signals']
+    assert first == {'file': 'rec.dat', 'format': '16', 'byte_offset': 24, 'gain': 200.0,
+                     'baseline': 10, 'description': 'MLII'}
+    assert second['gain'] == 100.0
+    assert second['baseline'] == 5  # ADC zero when no baseline is given
+    assert second['description'] == 'V5'
+
+def test_open_recording_skips_byte_offset(ecg_app, tmp_path):
+    values = np.arange(-500, 500, dtype='<i2')
+    (tmp_path / 'rec.dat').write_bytes(b'\xff' * 24 + values.tobytes())
+    (tmp_path / 'rec.hea').write_text('rec 1 500 1000\nrec.dat 16+24 200/mV 16 0 0 0 0 II\n')
+    
+    samples, sample_rate, gain, baseline = ecg_app.open_recording(tmp_path / 'rec.hea', 'wfdb')
+    
+    np.testing.assert_array_equal(samples, values)
+    assert (sample_rate, gain, baseline) == (500.0, 200.0, 0.0)
+
+def test_identical_signal_lines_select_their_own_column(ecg_app, tmp_path, trace):
+    counts, annotations = trace
+    flat = np.zeros_like(counts)
+    (tmp_path / 'rec.dat').write_bytes(np.stack([flat, counts], axis=1).astype('<i2').tobytes())
+    line = 'rec.dat 16 200/mV 16 0 0 0 0 II\n'
+    (tmp_path / 'rec.hea').write_text(f'rec 2 {SAMPLE_RATE} {len(counts)}\n' + line + line)
+    
+    samples, *_ = ecg_app.open_recording(tmp_path / 'rec.hea', 'wfdb', channel=1)
+    np.testing.assert_array_equal(samples, counts)
+    
+    metrics, hrv_analysis, info = ecg_app.analyze_recording(tmp_path / 'rec.hea', 'wfdb', channel=1)
+    assert info['channel'] == 1
+    assert metrics['r_peaks_detected'] == len(annotations['r_peak'])
+    assert hrv_analysis['sd1'] > 0
+    assert hrv_analysis['lf_hf'] is not None
+    flat_metrics, flat_hrv, _ = ecg_app.analyze_recording(tmp_path / 'rec.hea', 'wfdb', channel=0)
+    assert flat_metrics['r_peaks_detected'] == 0
+    assert all(value is None for value in flat_hrv.values())
+
+def test_chunk_edges_do_not_double_count_peaks(ecg_app, tmp_path, trace):
+    counts, annotations = trace
+    path = tmp_path / 'rec.dat'
+    counts.tofile(path)
+    r_peaks = annotations['r_peak']
+    
+    whole, whole_hrv, _ = ecg_app.analyze_recording(path, chunk_seconds=len(counts) / SAMPLE_RATE)
+    assert whole['r_peaks_detected'] == len(r_peaks)
+    
+    # Chunk boundaries exactly on an R peak, one sample either side, and at odd offsets
+    for chunk_samples in (r_peaks[5], r_peaks[5] + 1, r_peaks[5] - 1, 997, 3001):
+        chunked, chunked_hrv, info = ecg_app.analyze_recording(path, chunk_seconds=chunk_samples / SAMPLE_RATE,
+                                                  overlap_seconds=1)
+        assert info['chunks'] > 1
+        assert chunked['r_peaks_detected'] == whole['r_peaks_detected']
+        assert chunked['calculated_heart_rate'] == whole['calculated_heart_rate']
+        assert chunked['calculated_sdnn'] == whole['calculated_sdnn']
+        assert chunked_hrv == whole_hrv